@@ -1,6 +1,16 @@
 # Description: This file contains the implementation of an AVL tree data structure.
 # Tomer Nadiv & Ron Ben Harosh 2024
 
+from bisect import bisect_left, bisect_right
+from itertools import islice
+
+from MappedAVLTree import read_columns, write_columns
+
+try:
+	import numpy as np
+except ImportError:   # numpy is only needed by the batch query functions
+	np = None
+
 """
 Virtual Leafs and Root objects Classes:
 """
@@ -8,13 +18,25 @@ class VirtualLeaf(object):
 	"""
 	A class representing a virtual node in an AVL tree.
 	A virtual Leaf has no children, and a constant height, size, and balance factor.
+	The virtual leaf is immutable, so a single instance (VIRTUAL_LEAF) is shared by all nodes.
+	It therefore has no parent pointer - the parent of a virtual leaf is tracked by the caller.
 	"""
-	def __init__(self):
-		self.parent = None
-		self.height = -1
-		self.size = 0
-		self.right = None
-		self.left = None
+	__slots__ = ()
+	_instance = None
+
+	# constant attributes, read-only on the (slot-less) instance:
+	parent = None
+	height = -1
+	size = 0
+	node_count = 0
+	aggregates = None
+	right = None
+	left = None
+
+	def __new__(cls):
+		if cls._instance is None:
+			cls._instance = object.__new__(cls)
+		return cls._instance
 	
 	def __repr__(self):
 		return '-Virtual Leaf-'
@@ -30,17 +52,19 @@ class VirtualLeaf(object):
 	def balance_factor(self):
 		return 0
 
+VIRTUAL_LEAF = VirtualLeaf()
+
 class VirtualRoot(object):
 	"""
 	A class representing a virtual root node in an AVL tree.
 	A virtual Root has no parent, and the rest of the tree is his right subtree.
 	"""
+	__slots__ = ('key', 'left', 'right', 'size', 'parent')
+
 	def __init__(self):
 		self.key = float('-inf')
-		self.left = VirtualLeaf()
-		self.right = VirtualLeaf()
-		self.right.parent = self
-		self.left.parent = self
+		self.left = VIRTUAL_LEAF
+		self.right = VIRTUAL_LEAF
 		self.size = 0
 		self.parent = None
 
@@ -67,14 +91,18 @@ class AVLNode(object):
 	@type value: string
 	@param value: data of your node
 	"""
+	__slots__ = ('key', 'value', 'left', 'right', 'parent', 'height', 'size')
+
+	# constant attributes of plain nodes, stored per node by AugmentedAVLNode:
+	aggregates = None
+	live = True
+
 	def __init__(self, key, value):
 		self.key = key
 		self.value = value
-		self.left = VirtualLeaf()
-		self.right = VirtualLeaf()
-		self.parent = VirtualLeaf()
-		self.left.parent = self
-		self.right.parent = self
+		self.left = VIRTUAL_LEAF
+		self.right = VIRTUAL_LEAF
+		self.parent = VIRTUAL_LEAF   # detached until linked into a tree
 		self.height = 0
 		self.size = 1
 
@@ -110,14 +138,428 @@ class AVLNode(object):
 		return bf > 1 or bf < -1
 
 
+"""
+A class represnting a node of an AVL tree with aggregates or lazy deletion
+"""
+class AugmentedAVLNode(AVLNode):
+	"""
+	A node with the fields only some trees need, so plain trees keep the smaller AVLNode.
+	Used by the trees with aggregates or in lazy delete mode (see AVLTree._node_class).
+
+	@type key: int or None
+	@param key: key of your node
+	@type value: string
+	@param value: data of your node
+	"""
+	__slots__ = ('node_count', 'aggregates', 'live')
+
+	def __init__(self, key, value):
+		AVLNode.__init__(self, key, value)
+		self.node_count = 1          # nodes in the subtree of self, tombstones included (lazy delete mode)
+		self.aggregates = None       # subtree aggregates, a list ordered as the aggregates of the tree
+		self.live = True             # False once the node is a tombstone (lazy delete mode)
+
+
+"""
+A class representing an aggregate maintained over the subtrees of an AVL tree.
+"""
+class Aggregate(object):
+	"""
+	An associative aggregate (a monoid) over the items of a subtree, e.g. the sum of the values.
+	Every node stores the aggregate of its subtree, which is recomputed from its sons on rotations and fix-ups,
+	so the aggregate of any key range is answered in O(log(n)) by AVLTree.aggregate().
+
+	@type identity: any
+	@param identity: the neutral element - the aggregate of an empty range
+	@type combine: function (x, y) -> z
+	@param combine: associative operation, x aggregates smaller keys than y
+	@type lift: function (key, value) -> x or None
+	@param lift: the aggregate of a single item, defaults to its value
+	"""
+	__slots__ = ('identity', 'combine', 'lift')
+
+	def __init__(self, identity, combine, lift=None):
+		self.identity = identity
+		self.combine = combine
+		self.lift = lift if lift is not None else (lambda key, value: value)
+
+	def __repr__(self):
+		return '-AGGREGATE-\n identity: %r' % (self.identity,)
+
+	@staticmethod
+	def sum(lift=None):
+		"""
+		@rtype: Aggregate
+		@returns: the sum of the values (or of lift(key, value))
+		"""
+		return Aggregate(0, lambda x, y: x + y, lift)
+
+	@staticmethod
+	def minimum(lift=None):
+		"""
+		@rtype: Aggregate
+		@returns: the minimal value (or lift(key, value)), None for an empty range
+		"""
+		return Aggregate(None, lambda x, y: y if x is None or (y is not None and y < x) else x, lift)
+
+	@staticmethod
+	def maximum(lift=None):
+		"""
+		@rtype: Aggregate
+		@returns: the maximal value (or lift(key, value)), None for an empty range
+		"""
+		return Aggregate(None, lambda x, y: y if x is None or (y is not None and y > x) else x, lift)
+
+	@staticmethod
+	def count_if(predicate):
+		"""
+		@type predicate: function (key, value) -> bool
+		@rtype: Aggregate
+		@returns: the number of items matching predicate
+		"""
+		return Aggregate(0, lambda x, y: x + y, lambda key, value: 1 if predicate(key, value) else 0)
+
+	@staticmethod
+	def max_value():
+		"""
+		A tree maintaining this aggregate (under any name) answers max_range in O(log(n)).
+		The aggregated items are (value, key) pairs, so ties are broken towards the larger key.
+
+		@rtype: Aggregate
+		@returns: the (value, key) pair of the item with the maximal value, None for an empty range
+		"""
+		return MAX_VALUE
+
+# the single max_value() aggregate, recognized by AVLTree.max_range:
+MAX_VALUE = Aggregate.maximum(lambda key, value: (value, key))
+
+
+"""
+A class implementing an in-order cursor over an AVL tree.
+"""
+class AVLCursor(object):
+	"""
+	A cursor points to a node of an AVL tree, or to None once it moved past either end of the tree.
+	Moving the cursor costs amortized O(1), using the parent pointers and the cached maximum node.
+	Iterating over a cursor yields the current node and then moves to its successor.
+	Tombstones (lazy delete mode) are skipped.
+
+	@type tree: AVLTree
+	@param tree: the tree to walk over
+	@type node: AVLNode or None
+	@param node: the node the cursor initially points to, moved forward past tombstones
+	@type skip_tombstones: bool
+	@param skip_tombstones: if False, the cursor walks over tombstones as well
+	"""
+	__slots__ = ('tree', 'node', 'skip_tombstones')
+
+	def __init__(self, tree, node=None, skip_tombstones=True):
+		self.tree = tree
+		self.skip_tombstones = skip_tombstones
+		while skip_tombstones and node is not None and not node.live:
+			node = tree.successor(node)
+		self.node = node
+
+	def __repr__(self):
+		return '-AVL CURSOR-\n node: %r' % (self.node,)
+
+	def next(self):
+		"""
+		Moves the cursor to the successor of the current node.
+
+		@rtype: AVLNode
+		@returns: the new current node, None if the cursor moved past the maximum.
+		"""
+		node = self.node
+		while node is not None:
+			node = self.tree.successor(node)
+			if node is None or node.live or not self.skip_tombstones:
+				break
+		self.node = node
+		return node
+
+	def prev(self):
+		"""
+		Moves the cursor to the predecessor of the current node.
+
+		@rtype: AVLNode
+		@returns: the new current node, None if the cursor moved past the minimum.
+		"""
+		node = self.node
+		while node is not None:
+			node = self.tree.predecessor(node)
+			if node is None or node.live or not self.skip_tombstones:
+				break
+		self.node = node
+		return node
+
+	def seek(self, key):
+		"""
+		Moves the cursor to the node with the smallest key greater than or equal to key.
+		Time Complexity: O(log(n)).
+
+		@type key: int
+		@rtype: AVLNode
+		@returns: the new current node, None if all keys are smaller than key.
+		"""
+		node = self.tree._bound_above(key, False, self.skip_tombstones)
+		self.node = node
+		return node
+
+	def __iter__(self):
+		return self
+
+	def __next__(self):
+		node = self.node
+		if node is None:
+			raise StopIteration
+		self.next()
+		return node
+
+
+"""
+A class implementing a read-only sorted snapshot of an AVL tree.
+"""
+class AVLSnapshot(object):
+	"""
+	The items of an AVL tree at a given version, as two aligned sorted arrays (see AVLTree.snapshot()).
+	keys and values are read-only numpy arrays, or tuples if numpy is not installed.
+	All lookups are binary searches or indexing on the arrays.
+
+	@type keys: numpy.ndarray or tuple
+	@param keys: the sorted keys
+	@type values: numpy.ndarray or tuple
+	@param values: the values, aligned with keys
+	@type version: int
+	@param version: the version of the tree the snapshot was taken at
+	"""
+	__slots__ = ('keys', 'values', 'version')
+
+	def __init__(self, keys, values, version):
+		self.keys = keys
+		self.values = values
+		self.version = version
+
+	@classmethod
+	def from_items(cls, items, version):
+		"""
+		Creates a snapshot from a sorted list of (key, value) tuples.
+		Time Complexity: O(n).
+
+		@type items: list
+		@rtype: AVLSnapshot
+		"""
+		keys = tuple(key for key, _ in items)
+		values = tuple(value for _, value in items)
+		if np is None:
+			return cls(keys, values, version)
+		key_array = np.array(keys)
+		value_array = np.empty(len(values), dtype=object)
+		value_array[:] = values
+		key_array.flags.writeable = False
+		value_array.flags.writeable = False
+		return cls(key_array, value_array, version)
+
+	def __repr__(self):
+		return '-AVL SNAPSHOT-\n version: %d\n size: %d' % (self.version, len(self.keys))
+
+	def __len__(self):
+		return len(self.keys)
+
+	def __iter__(self):
+		return zip(self.keys, self.values)
+
+	def _bisect(self, key, right=False):
+		"""
+		returns the number of keys smaller than key (smaller or equal, if right)
+		Time Complexity: O(log(n)).
+
+		@rtype: int
+		"""
+		if np is None:
+			return bisect_right(self.keys, key) if right else bisect_left(self.keys, key)
+		return int(np.searchsorted(self.keys, key, side='right' if right else 'left'))
+
+	def search(self, key, default=None):
+		"""
+		returns the value of key, default if it is not in the snapshot
+		Time Complexity: O(log(n)).
+		"""
+		i = self._bisect(key)
+		if i < len(self.keys) and self.keys[i] == key:
+			return self.values[i]
+		return default
+
+	def rank(self, key):
+		"""
+		returns the rank of key, 0 if it is not in the snapshot
+		Time Complexity: O(log(n)).
+
+		@rtype: int
+		"""
+		i = self._bisect(key)
+		if i < len(self.keys) and self.keys[i] == key:
+			return i + 1
+		return 0
+
+	def select(self, i):
+		"""
+		returns the (key, value) item of rank i
+		Time Complexity: O(1).
+
+		@type i: int
+		@pre: 1 <= i <= len(self)
+		@rtype: tuple
+		"""
+		return self.keys[i - 1], self.values[i - 1]
+
+	def range(self, a, b):
+		"""
+		returns the keys and values of the items with a <= key <= b, as slices (views, with numpy) of the snapshot
+		Time Complexity: O(log(n)) with numpy, O(log(n) + k) otherwise.
+
+		@rtype: tuple
+		@returns: (keys, values)
+		"""
+		i = self._bisect(a)
+		j = self._bisect(b, right=True)
+		return self.keys[i:j], self.values[i:j]
+
+
 """
 A class implementing an AVL tree.
 """
 class AVLTree(object):
+	"""
+	@type aggregates: dict or None
+	@param aggregates: named Aggregate objects, maintained over the subtree of every node (see aggregate()).
+					   Values are only compared by the aggregates, and by max_range - register Aggregate.max_value() for an O(log(n)) max_range.
+	@type lazy_delete: bool
+	@param lazy_delete: if True, delete_key only marks the node as a tombstone, without rotations.
+						The size of every subtree counts only live nodes, so size, rank and select skip tombstones.
+	@type tombstone_fraction: float
+	@param tombstone_fraction: in lazy delete mode, the tree is rebuilt once tombstones exceed this fraction of its nodes.
+	"""
 
-	def __init__(self):
+	def __init__(self, aggregates=None, lazy_delete=False, tombstone_fraction=0.25):
+		self.lazy_delete = lazy_delete
+		self.tombstone_fraction = tombstone_fraction
+		self._tombstones = 0
+		self._version = 0             # modification counter, bumped whenever the items change
+		self._snapshot = None         # cached AVLSnapshot, valid while its version == _version
 		self.virtual_root = VirtualRoot()
 		self.max_node = self.virtual_root  # initialize the maximum node to be the virtual root
+		self.min_node = self.virtual_root  # initialize the minimum node to be the virtual root
+		self.aggregates = dict(aggregates) if aggregates else {}
+		self._aggregate_index = {name: i for i, name in enumerate(self.aggregates)}
+		self._aggregate_specs = list(self.aggregates.values())
+		self._max_value_index = next((i for i, spec in enumerate(self._aggregate_specs) if spec is MAX_VALUE), None)
+		self._node_class = AugmentedAVLNode if lazy_delete or self._aggregate_specs else AVLNode
+
+	@classmethod
+	def from_sorted(cls, pairs, aggregates=None, lazy_delete=False, tombstone_fraction=0.25):
+		"""
+		Builds a perfectly balanced tree from items sorted by key, bottom-up and without rebalancing.
+		pairs may be any iterable (e.g. a generator), it is consumed once.
+		Time Complexity: O(n).
+
+		@type pairs: iterable of tuples (key, value)
+		@pre: keys are strictly increasing
+		@param pairs: the items of the dictionary
+		@type aggregates: dict or None
+		@param aggregates: named Aggregate objects, as in the constructor
+		@type lazy_delete: bool
+		@type tombstone_fraction: float
+		@param lazy_delete, tombstone_fraction: as in the constructor
+		@rtype: AVLTree
+		@returns: a new tree holding the items
+		"""
+		tree = cls(aggregates, lazy_delete, tombstone_fraction)
+		node_class = tree._node_class
+		tree._build_balanced([node_class(key, value) for key, value in pairs])
+		return tree
+
+	@classmethod
+	def load(cls, path, aggregates=None, lazy_delete=False, tombstone_fraction=0.25):
+		"""
+		Loads a tree written by dump(). The items are stored sorted, so the tree is rebuilt without rebalancing.
+		For read-only use, MappedAVLTree answers queries from the file without loading it.
+		Time Complexity: O(n).
+
+		@type path: str
+		@param path: the file to read
+		@type aggregates: dict or None
+		@type lazy_delete: bool
+		@type tombstone_fraction: float
+		@param aggregates, lazy_delete, tombstone_fraction: as in the constructor
+		@rtype: AVLTree
+		"""
+		keys, values = read_columns(path)
+		return cls.from_sorted(zip(keys, values), aggregates, lazy_delete, tombstone_fraction)
+
+	def dump(self, path):
+		"""
+		Writes the items of the dictionary to a compact binary file: a header, then the sorted key and value columns
+		(see MappedAVLTree.py). Numeric keys and values are stored as 64-bit columns, strings as utf-8 and other values pickled.
+		Tombstones are not written.
+		Time Complexity: O(n).
+
+		@type path: str
+		@param path: the file to write
+		@rtype: None
+		"""
+		write_columns(path, self.size(), self.keys, self.values)
+
+	def _build_balanced(self, nodes):
+		"""
+		Links a list of nodes sorted by key into a perfectly balanced tree, which replaces the content of self.
+		The height, size and aggregates of every node are set directly.
+		Time Complexity: O(n).
+
+		@type nodes: list of AVLNode
+		@pre: keys are strictly increasing, and no node is a tombstone
+		@rtype: None
+		"""
+		update_aggregates = self._update_aggregates if self._aggregate_specs else None
+		lazy_delete = self.lazy_delete
+
+		def build_rec(lo, hi):
+			"""
+			Recursive build of nodes[lo:hi], the middle node is the root.
+
+			@rtype: AVLNode or VirtualLeaf
+			@returns: root of the subtree
+			"""
+			if lo >= hi:
+				return VIRTUAL_LEAF
+			mid = (lo + hi) // 2
+			node = nodes[mid]
+			left = build_rec(lo, mid)
+			right = build_rec(mid + 1, hi)
+			node.left = left
+			node.right = right
+			if left is not VIRTUAL_LEAF:
+				left.parent = node
+			if right is not VIRTUAL_LEAF:
+				right.parent = node
+			node.height = (left.height if left.height > right.height else right.height) + 1
+			node.size = hi - lo
+			if lazy_delete:
+				node.node_count = hi - lo
+			if update_aggregates is not None:
+				update_aggregates(node)
+			return node
+
+		virtual_root = self.virtual_root
+		root = build_rec(0, len(nodes))
+		virtual_root.right = root
+		if root is not VIRTUAL_LEAF:
+			root.parent = virtual_root
+		virtual_root.size = len(nodes)
+		self._tombstones = 0
+		self._version += 1
+		self.max_node = nodes[-1] if nodes else virtual_root
+		self.min_node = nodes[0] if nodes else virtual_root
 
 	def get_root(self):
 		"""
@@ -139,7 +581,7 @@ class AVLTree(object):
 		@type key: int
 		@param key: a key to be searched
 		@rtype: AVLNode
-		@returns: node corresponding to key
+		@returns: node corresponding to key, None if key does not appear in the dictionary
 		"""
 
 		node = self.virtual_root
@@ -147,9 +589,9 @@ class AVLTree(object):
 		# if tree is not enpy:
 		while node.is_real_node() or isinstance(node, VirtualRoot):
 
-			# found key:
+			# found key (tombstones are not returned):
 			if node.key == key:
-				return node
+				return node if node.live else None
 
 			# left turn:
 			if key < node.key:
@@ -164,6 +606,7 @@ class AVLTree(object):
 	def insert(self, key, val):
 		"""
 		inserts a new node into the dictionary with corresponding key and value
+		A single descent finds either the key or the virtual leaf to attach the new node to.
 		Time Complexity: O(log(n)).
 
 		@type key: int
@@ -174,65 +617,171 @@ class AVLTree(object):
 		@rtype: int
 		@returns: the number of rebalancing operation due to AVL rebalancing
 		"""
-		# if the key appears in the tree:
-		node = self.search(key)
-		if node != None:
-			node.value = val   # switch the value
-			return 0
-		
-		# if we need to add the key:
-		node = self.virtual_root
-
-		while node.is_real_node() or isinstance(node, VirtualRoot):   # keep going if it's a virtual root or a real node
-			if key < node.key:      # left turn
+		parent = self.virtual_root
+		node = parent.right
+
+		while node is not VIRTUAL_LEAF:  # keep going until a virtual leaf is reached, remembering its parent
+			node_key = node.key
+			if key == node_key:          # the key appears in the tree
+				self._set_value(node, val)
+				return 0
+			parent = node
+			if key < node_key:           # left turn
 				node = node.left
-			else:                   # right turn
+			else:                        # right turn
 				node = node.right
 
-		# insert the new node and fix pointers:
-		new_node = AVLNode(key, val)
-		parent = node.parent
-		if parent.left == node:
+		return self._attach(parent, key, val)[1]
+
+	def _set_value(self, node, val):
+		"""
+		Switches the value of a node already in the tree, reviving it if it is a tombstone.
+		The path to the root is only updated if a tombstone is revived (sizes change) or if values are aggregated.
+		Time Complexity: O(1), O(log(n)) when reviving a tombstone or with aggregates.
+
+		@type node: AVLNode
+		@rtype: None
+		"""
+		node.value = val
+		self._version += 1
+		if not node.live:
+			node.live = True
+			self._tombstones -= 1
+		elif not self._aggregate_specs:
+			return
+		self._update_upward(node)
+
+	def _attach(self, parent, key, val, nodes_visited=0):
+		"""
+		Creates a new node as a son of parent, rebalances the tree and updates the maximum node.
+
+		@type parent: AVLNode or VirtualRoot
+		@param parent: the node whose virtual leaf son is replaced by the new node
+		@type nodes_visited: int
+		@param nodes_visited: the number of nodes the search for parent visited (recorded by InstrumentedAVLTree)
+		@rtype: tuple
+		@returns: (new_node, number of rebalancing operations)
+		"""
+		# insert the new node and fix pointers (the shared leaf has no parent, so compare keys):
+		self._version += 1
+		new_node = self._node_class(key, val)
+		if key < parent.key:
 			parent.left = new_node
 		else:
 			parent.right = new_node
 		new_node.parent = parent
 
+		rebalances = self._fix_after_insert(new_node)
 
-        # Travel up, for each node change the height and check if it's criminal.
-		# Count height change as +1, rotations as +1 or +2.
-		# Stop when reaching the virtual root, as size maintenance is done there.
+		# Update the maximum and minimum nodes if needed (an equal key is attached to the right, so it is the new maximum):
+		if key >= self.max_node.key:
+			self.max_node = new_node
+		if self.min_node is self.virtual_root or key < self.min_node.key:
+			self.min_node = new_node
+
+		return new_node, rebalances
+
+	def _fix_after_insert(self, new_node):
+		"""
+		Travel up from a newly attached node, for each node change the height and check if it's criminal.
+		Count height change as +1, rotations as +1 or +2.
+		Once a height is unchanged or a rotation was made, the heights above cannot change [OBS 3],
+		so from that point on only the sizes are updated, up to the virtual root.
+		Time Complexity: O(log(n)).
 
+		@type new_node: AVLNode
+		@param new_node: the inserted node, already linked to its parent.
+		@rtype: int
+		@returns: the number of rebalancing operation due to AVL rebalancing
+		"""
+		virtual_root = self.virtual_root
+		lazy_delete = self.lazy_delete
 		rebalances = 0 							   # initialize counter
 		curr_node = new_node.parent 			   # start from the new node
-		while curr_node.is_real_node():            # continue until the virtual root is reached (or encounter break command)
+		while curr_node is not virtual_root:
 			next_node = curr_node.parent           # save the next node before changing it
-			# Update height:
-			old_height = curr_node.height          # save old height
-			new_height = max(curr_node.left.height, curr_node.right.height) + 1  # update height
-			curr_node.height = new_height		   # update height
+			left_height = curr_node.left.height
+			right_height = curr_node.right.height
+			new_height = (left_height if left_height > right_height else right_height) + 1
+			bf = left_height - right_height
 
 			# Decide the next move:
-			if curr_node.is_criminal():            # [OBS 1]
-				rebalances += self.balance(curr_node)
-			else: 
-				curr_node.size += 1                # update size
-				if new_height != old_height:       # [OBS 3]
-					rebalances += 1				   # count the number of height changes
-			curr_node = next_node		           # continue to the next node		
-		
-		# Update Virtual Root Size & Height:
-		self.virtual_root.size += 1
+			if bf > 1 or bf < -1:                  # [OBS 1]
+				curr_node.height = new_height
+				rebalances += self.balance(curr_node)  # rotations recompute the sizes
+				curr_node = next_node
+				break
+			curr_node.size += 1                    # update sizes
+			if lazy_delete:
+				curr_node.node_count += 1
+			if new_height == curr_node.height:     # [OBS 3]
+				curr_node = next_node
+				break
+			curr_node.height = new_height		   # update height
+			rebalances += 1				           # count the number of height changes
+			curr_node = next_node		           # continue to the next node
+
+		# Heights above are unchanged, only update the sizes:
+		while curr_node is not virtual_root:
+			curr_node.size += 1
+			if lazy_delete:
+				curr_node.node_count += 1
+			curr_node = curr_node.parent
+
+		# Update Virtual Root Size:
+		virtual_root.size += 1
+
+		# Aggregates change on every ancestor of the new node:
+		if self._aggregate_specs:
+			curr_node = new_node
+			while curr_node is not virtual_root:
+				self._update_aggregates(curr_node)
+				curr_node = curr_node.parent
+		return rebalances
 
-		# Update the maximum node if needed:
-		if new_node.key > self.max_node.key:
-			self.max_node = new_node
+	def _update_upward(self, node):
+		"""
+		Recomputes the sizes and aggregates from node up to the real root,
+		after the value of node changed or node became (or stopped being) a tombstone.
+		Time Complexity: O(log(n)).
 
-		return rebalances
+		@type node: AVLNode
+		@rtype: None
+		"""
+		virtual_root = self.virtual_root
+		while node is not virtual_root:
+			node.size = node.left.size + node.right.size + node.live
+			if self._aggregate_specs:
+				self._update_aggregates(node)
+			node = node.parent
+		virtual_root.size = virtual_root.right.size
+
+	def _update_aggregates(self, node):
+		"""
+		Recomputes the aggregates of node from the aggregates of its sons.
+
+		@type node: AVLNode
+		@rtype: None
+		"""
+		left = node.left.aggregates
+		right = node.right.aggregates
+		key = node.key
+		value = node.value
+		aggregates = []
+		live = node.live
+		for i, spec in enumerate(self._aggregate_specs):
+			x = spec.lift(key, value) if live else spec.identity
+			if left is not None:
+				x = spec.combine(left[i], x)
+			if right is not None:
+				x = spec.combine(x, right[i])
+			aggregates.append(x)
+		node.aggregates = aggregates
 	
 	def delete(self, node):
 		"""
 		deletes node from the dictionary
+		The node is removed from the tree, also in lazy delete mode (see delete_key).
 		Time Complexity: O(log(n)).
 
 		@type node: AVLNode
@@ -240,6 +789,8 @@ class AVLTree(object):
 		@rtype: int
 		@returns: the number of rebalancing operation due to AVL rebalancing
 		"""
+		self._version += 1
+
 		# Case 1: node has less than 2 children:
 		if not node.left.is_real_node() or not node.right.is_real_node():
 			# find the child node
@@ -253,14 +804,29 @@ class AVLTree(object):
 				node.parent.left = child
 			else:                           # node is a right child
 				node.parent.right = child
-			child.parent = node.parent      # upward pointer
+			if child.is_real_node():        # the shared virtual leaf has no upward pointer
+				child.parent = node.parent  # upward pointer
 
-			start_node = child.parent       # just for interpertable naming
+			# Update the maximum node if needed, the new maximum is the predecessor of node:
+			if node is self.max_node:
+				self.max_node = child if child.is_real_node() else node.parent
+
+			# Update the minimum node if needed, the new minimum is the successor of node:
+			if node is self.min_node:
+				self.min_node = child if child.is_real_node() else node.parent
+
+			if not node.live:               # a tombstone is removed
+				self._tombstones -= 1
+
+			start_node = node.parent        # just for interpertable naming
 
 		# Case 2: node has exactly 2 children:
 		else:
 			successor = self.successor(node)
-			node.key, node.value = successor.key, successor.value  # replace node inplace
+			# replace node inplace, the successor node takes the live flag of the removed item:
+			node.key, node.value = successor.key, successor.value
+			if self.lazy_delete:
+				node.live, successor.live = successor.live, node.live
 			return self.delete(successor)                          # delete successor -> will go to Case 1
 		
 
@@ -273,8 +839,12 @@ class AVLTree(object):
 		while curr_node.is_real_node():			   # continue until the virtual root is reached        
 			next_node = curr_node.parent           # save the next node before changing it
 			
-			# Update size:
-			curr_node.size -= 1                   
+			# Update sizes and aggregates:
+			curr_node.size = curr_node.left.size + curr_node.right.size + curr_node.live
+			if self.lazy_delete:
+				curr_node.node_count = curr_node.left.node_count + curr_node.right.node_count + 1
+			if self._aggregate_specs:
+				self._update_aggregates(curr_node)
 			
 			# Update height:
 			old_height = curr_node.height          # save old height
@@ -290,16 +860,55 @@ class AVLTree(object):
 			curr_node = next_node                  # continue		
 
 		# Update Virtual Root Size & Height:
-		self.virtual_root.size -= 1
-		
-		# Update the maximum node if needed:
-		if node == self.max_node:
-			new_max = self.maximum()
-			self.max_node = new_max if new_max != None else self.virtual_root
+		self.virtual_root.size = self.virtual_root.right.size
 		
 		# Return the number of rebalances:
 		return rebalances	
 
+	def delete_key(self, key):
+		"""
+		deletes the item with the given key from the dictionary
+		In lazy delete mode the node is only marked as a tombstone, and the sizes and aggregates
+		on its path are updated without rotations. Once the tombstones exceed tombstone_fraction of the nodes,
+		the tree is rebuilt without them in one O(n) pass.
+		Time Complexity: O(log(n)), amortized in lazy delete mode.
+
+		@type key: int
+		@param key: the key to delete
+		@rtype: int
+		@returns: the number of rebalancing operation due to AVL rebalancing, 0 if key does not appear in the dictionary
+		"""
+		node = self.search(key)
+		if node is None:
+			return 0
+		if not self.lazy_delete:
+			return self.delete(node)
+
+		node.live = False
+		self._tombstones += 1
+		self._version += 1
+		self._update_upward(node)
+		if self._tombstones > self.tombstone_fraction * (self.size() + self._tombstones):
+			self.compact()
+		return 0
+
+	def compact(self):
+		"""
+		Rebuilds the tree without its tombstones, as a perfectly balanced tree.
+		Time Complexity: O(n).
+
+		@rtype: None
+		"""
+		self._merge_rebuild((), ())
+
+	def tombstones(self):
+		"""
+		returns the number of tombstones in the tree (lazy delete mode)
+
+		@rtype: int
+		"""
+		return self._tombstones
+
 	def avl_to_array(self):
 		"""
 		Returns an array representing the dictionary.
@@ -308,30 +917,109 @@ class AVLTree(object):
 		@rtype: list
 		@returns: a sorted list according to key of tuples (key, value) representing the data structure
 		"""
-		def avl_to_array_rec(node, array):
-			"""
-			Recurssive in-order walk.
-
-			@type node: AVLnode.
-			@param node: real root of the tree.
-			@type array: python list.
-			@param array: current version of dictionary as a sorted array.
-			@rtype: python list.
-			@returns: sorted dictionary ADT as a sorted array.
-			"""
-			if isinstance(node, VirtualLeaf):
-				return
-			avl_to_array_rec(node.left, array)
-			array.append((node.key, node.value))
-			avl_to_array_rec(node.right, array)
-
-		array = []
-		avl_to_array_rec(self.virtual_root.right, array)
-		return array
+		return list(self.items())
+
+	def items(self, lo=None, hi=None, reverse=False):
+		"""
+		Iterates over the (key, value) items of the dictionary with lo <= key <= hi, in key order.
+		Time Complexity: O(log(n) + k) for k items, with O(log(n)) extra memory.
+
+		@type lo: int or None
+		@param lo: the smallest key to yield, None for no lower bound.
+		@type hi: int or None
+		@param hi: the largest key to yield, None for no upper bound.
+		@type reverse: bool
+		@param reverse: if True, the items are yielded in descending order.
+		"""
+		for node in self._walk(lo, hi, reverse):
+			yield node.key, node.value
+
+	def keys(self, lo=None, hi=None, reverse=False):
+		"""
+		Iterates over the keys of the dictionary with lo <= key <= hi, as items().
+		"""
+		for node in self._walk(lo, hi, reverse):
+			yield node.key
+
+	def values(self, lo=None, hi=None, reverse=False):
+		"""
+		Iterates over the values of the items with lo <= key <= hi, as items().
+		"""
+		for node in self._walk(lo, hi, reverse):
+			yield node.value
+
+	def _walk(self, lo, hi, reverse):
+		"""
+		Iterative in-order walk over the live nodes with lo <= key <= hi.
+		The stack holds the ancestors of the current node that are still to be visited, so it never exceeds the height of the tree.
+
+		@rtype: generator of AVLNode
+		"""
+		stack = []
+		node = self.virtual_root.right
+		if not reverse:
+			# descend to the first node with key >= lo:
+			while node is not VIRTUAL_LEAF:
+				if lo is not None and node.key < lo:
+					node = node.right
+				else:
+					stack.append(node)
+					node = node.left
+			while stack:
+				node = stack.pop()
+				if hi is not None and node.key > hi:
+					return
+				if node.live:
+					yield node
+				node = node.right
+				while node is not VIRTUAL_LEAF:
+					stack.append(node)
+					node = node.left
+		else:
+			# descend to the last node with key <= hi:
+			while node is not VIRTUAL_LEAF:
+				if hi is not None and node.key > hi:
+					node = node.left
+				else:
+					stack.append(node)
+					node = node.right
+			while stack:
+				node = stack.pop()
+				if lo is not None and node.key < lo:
+					return
+				if node.live:
+					yield node
+				node = node.left
+				while node is not VIRTUAL_LEAF:
+					stack.append(node)
+					node = node.right
+
+	def snapshot(self):
+		"""
+		Returns a read-only sorted view of the dictionary.
+		The snapshot is cached, and only rebuilt after the dictionary was modified,
+		so repeated exports of an unchanged tree cost O(1).
+		Time Complexity: O(1) if the tree did not change since the last snapshot, O(n) otherwise.
+
+		@rtype: AVLSnapshot
+		@returns: the keys and values of the dictionary, as aligned sorted arrays.
+		"""
+		snapshot = self._snapshot
+		if snapshot is None or snapshot.version != self._version:
+			snapshot = self._snapshot = AVLSnapshot.from_items(self.avl_to_array(), self._version)
+		return snapshot
+
+	def version(self):
+		"""
+		returns the modification counter of the dictionary, which changes whenever its items change
+
+		@rtype: int
+		"""
+		return self._version
 		 
 	def size(self):
 		"""
-		returns the number of items in dictionary 
+		returns the number of items in dictionary (tombstones are not counted)
 
 		@rtype: int
 		@returns: the number of items in dictionary 
@@ -349,11 +1037,12 @@ class AVLTree(object):
 		@rtype: int
 		@returns: the rank of node in self
 		"""
-		cnt = node.left.size                      # initialize counter with the number of nodes in the left subtree
-		while node.is_real_node():                # climb up until the virtual root is reached
-			if node == node.parent.right:         # if node is a right child
-				cnt += node.parent.left.size + 1  # add the size of the left subtree and the parent
-			node = node.parent                    # climb up
+		cnt = node.left.size + 1                  # initialize counter with the number of nodes in the left subtree and node
+		while node.parent.is_real_node():         # climb up until the real root is reached
+			parent = node.parent
+			if node is parent.right:              # if node is a right child
+				cnt += parent.left.size + parent.live  # add the size of the left subtree and the parent (unless a tombstone)
+			node = parent                         # climb up
 		return cnt
 
 	def select(self, i):
@@ -368,18 +1057,20 @@ class AVLTree(object):
 		@returns: the node of rank i in self
 		"""
 		node = self.get_root() 					# start from the root
-		while node.left.size + 1 != i: 			# continue until the rank of the root is i
-			if i < node.left.size + 1: 			# if the i'th smallest node is in the left subtree
+		while not (node.live and node.left.size + 1 == i): 	# continue until the rank of the (live) root is i
+			if i <= node.left.size: 			# if the i'th smallest node is in the left subtree
 				node = node.left
 			else: 								# if the i'th smallest node is in the right subtree
-				i -= node.left.size + 1 		# update i
+				i -= node.left.size + node.live # update i, tombstones do not count
 				node = node.right 				# continue to the right subtree
 		return node 							# the while loop will end as 1 <= i <= self.size()
 
 	def max_range(self, a, b):
 		"""
 		finds the node with the largest value in a specified range of keys
-		Time Complexity: O(n).
+		If the tree maintains Aggregate.max_value(), only the two O(log(n)) boundary paths of the range are visited,
+		otherwise the items of the range are scanned. Values are only compared here, so they must be comparable.
+		Time Complexity: O(log(n)) with Aggregate.max_value(), O(log(n) + k) for k keys in the range otherwise.
 
 		@type a: int
 		@param a: the lower end of the range
@@ -387,37 +1078,438 @@ class AVLTree(object):
 		@param b: the upper end of the range
 		@pre: a<b
 		@rtype: AVLNode
-		@returns: the node with maximal (lexicographically) value having a<=key<=b, or None if no such keys exist
+		@returns: the node with maximal (lexicographically) value having a<=key<=b, or None if no such keys exist.
+				  Among equal values, the node with the larger key is returned.
 		"""
-		# find the node with the smallest key greater than or equal to a
-		node = self.get_root()
-		while node.is_real_node() and not node.key == a:
-			if node.key < a:
-				node = node.right
-			else:
-				node = node.left
-
-		# if node is a virtual node:
-		if not node.is_real_node():
-			# check if node is a right son:
-			if node.parent.right == node:
-				node = self.successor(node.parent)
-			else:
-				node = node.parent
-		
-		# perform a maximum of (b-a) successor calls:
-		max_val_node = node
-		while node.is_real_node() and node.key <= b:
-			if node.value >= max_val_node.value:
+		if self._max_value_index is not None:
+			max_item = self._aggregate_range(self._max_value_index, a, b)
+			if max_item is None:    # no keys in the range
+				return None
+			return self.search(max_item[1])
+
+		max_val_node = None
+		for node in self._walk(a, b, False):
+			if max_val_node is None or node.value >= max_val_node.value:
 				max_val_node = node
-			node = self.successor(node)
 		return max_val_node
 
-	def rotate_left(self, node):
+	def aggregate(self, a, b, name=None):
 		"""
-		Performs a left rotation.
+		computes a registered aggregate over a specified range of keys
+		Only the two O(log(n)) boundary paths of the range are visited,
+		and the aggregates are combined in key order, so non-commutative aggregates are supported.
+		Time Complexity: O(log(n)).
 
-		@node type: AVLnode.
+		@type a: int
+		@param a: the lower end of the range
+		@type b: int
+		@param b: the upper end of the range
+		@type name: str or None
+		@param name: name of the aggregate, may be omitted if the tree has a single aggregate
+		@rtype: any
+		@returns: the aggregate of the items having a<=key<=b, the identity of the aggregate if no such keys exist
+		"""
+		if name is None and len(self._aggregate_specs) == 1:
+			return self._aggregate_range(0, a, b)
+		return self._aggregate_range(self._aggregate_index[name], a, b)
+
+	def _aggregate_range(self, i, a, b):
+		"""
+		Computes the i'th aggregate of the tree over the items having a<=key<=b, see aggregate().
+		Time Complexity: O(log(n)).
+
+		@type i: int
+		@rtype: any
+		"""
+		spec = self._aggregate_specs[i]
+		identity, combine, lift = spec.identity, spec.combine, spec.lift
+
+		node = self._split_node(a, b)
+		if node is None:            # no keys in the range
+			return identity
+
+		# left boundary - collected from right to left, so each piece is combined before the result so far:
+		left_result = identity
+		curr_node = node.left
+		while curr_node is not VIRTUAL_LEAF:
+			if curr_node.key >= a:
+				piece = lift(curr_node.key, curr_node.value) if curr_node.live else identity
+				if curr_node.right is not VIRTUAL_LEAF:
+					piece = combine(piece, curr_node.right.aggregates[i])
+				left_result = combine(piece, left_result)
+				curr_node = curr_node.left
+			else:
+				curr_node = curr_node.right
+
+		# right boundary - collected from left to right:
+		right_result = identity
+		curr_node = node.right
+		while curr_node is not VIRTUAL_LEAF:
+			if curr_node.key <= b:
+				piece = lift(curr_node.key, curr_node.value) if curr_node.live else identity
+				if curr_node.left is not VIRTUAL_LEAF:
+					piece = combine(curr_node.left.aggregates[i], piece)
+				right_result = combine(right_result, piece)
+				curr_node = curr_node.right
+			else:
+				curr_node = curr_node.left
+
+		middle = lift(node.key, node.value) if node.live else identity
+		return combine(combine(left_result, middle), right_result)
+
+	def _split_node(self, a, b):
+		"""
+		Returns the split node of a range of keys - the highest node with a<=key<=b.
+		Time Complexity: O(log(n)).
+
+		@rtype: AVLNode
+		@returns: the split node, None if no keys are in the range.
+		"""
+		node = self.virtual_root.right
+		while node is not VIRTUAL_LEAF and not a <= node.key <= b:
+			if node.key < a:
+				node = node.right
+			else:
+				node = node.left
+		if node is VIRTUAL_LEAF:
+			return None
+		return node
+
+	def count_range(self, a, b):
+		"""
+		counts the items with a<=key<=b
+		Uses the sizes on the search paths of the two boundaries, as rank(b) - rank(a) would.
+		Time Complexity: O(log(n)).
+
+		@type a: int
+		@param a: the lower end of the range
+		@type b: int
+		@param b: the upper end of the range
+		@rtype: int
+		@returns: the number of items in the range, 0 if a>b
+		"""
+		if a > b:
+			return 0
+		return self._count_smaller(b, True) - self._count_smaller(a, False)
+
+	def range_items(self, a, b, limit=None):
+		"""
+		Iterates over the (key, value) items with a<=key<=b, in key order.
+		Time Complexity: O(log(n) + k) for k reported items.
+
+		@type a: int
+		@param a: the lower end of the range
+		@type b: int
+		@param b: the upper end of the range
+		@type limit: int or None
+		@param limit: the maximal number of items to report, None for all of them
+		"""
+		items = self.items(a, b)
+		if limit is not None:
+			items = islice(items, limit)
+		return items
+
+	def floor(self, key):
+		"""
+		finds the item with the largest key smaller than or equal to key
+		Time Complexity: O(log(n)).
+
+		@type key: int
+		@rtype: AVLNode
+		@returns: the floor node of key, None if all keys are larger than key
+		"""
+		return self._bound_below(key, False)
+
+	def ceiling(self, key):
+		"""
+		finds the item with the smallest key greater than or equal to key
+		Time Complexity: O(log(n)).
+
+		@type key: int
+		@rtype: AVLNode
+		@returns: the ceiling node of key, None if all keys are smaller than key
+		"""
+		return self._bound_above(key, False)
+
+	def lower_bound(self, key):
+		"""
+		finds the first item whose key is not smaller than key (the same node as ceiling)
+		Time Complexity: O(log(n)).
+
+		@type key: int
+		@rtype: AVLNode
+		@returns: the lower bound node of key, None if all keys are smaller than key
+		"""
+		return self._bound_above(key, False)
+
+	def upper_bound(self, key):
+		"""
+		finds the first item whose key is greater than key
+		Time Complexity: O(log(n)).
+
+		@type key: int
+		@rtype: AVLNode
+		@returns: the upper bound node of key, None if all keys are smaller than or equal to key
+		"""
+		return self._bound_above(key, True)
+
+	def _count_smaller(self, key, inclusive):
+		"""
+		Counts the items with a key smaller than key (or equal to it, if inclusive), tombstones are not counted.
+		Time Complexity: O(log(n)).
+
+		@rtype: int
+		"""
+		count = 0
+		node = self.virtual_root.right
+		while node is not VIRTUAL_LEAF:
+			node_key = node.key
+			if node_key < key or (inclusive and node_key == key):
+				count += node.left.size + node.live  # node and its left subtree are counted
+				node = node.right
+			else:
+				node = node.left
+		return count
+
+	def _bound_above(self, key, strict, skip_tombstones=True):
+		"""
+		Returns the live node with the smallest key greater than key (or equal to it, if not strict).
+		With tombstones in the tree, the node is found by rank instead, as the closest node may be a tombstone.
+		Also the search of AVLCursor.seek and iter_from.
+		Time Complexity: O(log(n)).
+
+		@type skip_tombstones: bool
+		@param skip_tombstones: if False, the closest node is returned even if it is a tombstone
+		@rtype: AVLNode or None
+		"""
+		if skip_tombstones and self._tombstones:
+			smaller = self._count_smaller(key, strict)
+			return self.select(smaller + 1) if smaller < self.size() else None
+		node = self.virtual_root.right
+		bound = None
+		while node is not VIRTUAL_LEAF:
+			node_key = node.key
+			if node_key > key:
+				bound = node
+				node = node.left
+			elif node_key == key and not strict:   # the key itself is its ceiling
+				return node
+			else:
+				node = node.right
+		return bound
+
+	def _bound_below(self, key, strict):
+		"""
+		Returns the live node with the largest key smaller than key (or equal to it, if not strict), as _bound_above.
+		Time Complexity: O(log(n)).
+
+		@rtype: AVLNode or None
+		"""
+		if self._tombstones:
+			smaller = self._count_smaller(key, not strict)
+			return self.select(smaller) if smaller > 0 else None
+		node = self.virtual_root.right
+		bound = None
+		while node is not VIRTUAL_LEAF:
+			if node.key < key or (not strict and node.key == key):
+				bound = node
+				node = node.right
+			else:
+				node = node.left
+		return bound
+
+	@staticmethod
+	def join(left, pivot, right):
+		"""
+		Joins two trees and a pivot node into one tree.
+		The pivot is attached to the taller tree at the height of the shorter one, and the path above it is rebalanced.
+		left and right are emptied.
+		Time Complexity: O(log(n)), more precisely O(|height(left) - height(right)| + 1).
+
+		@type left: AVLTree
+		@type pivot: AVLNode
+		@pre: pivot is not in a tree, and every key of left < pivot.key < every key of right
+		@type right: AVLTree
+		@pre: left and right have the same aggregates
+		@rtype: AVLTree
+		@returns: a new tree holding the items of left, pivot and right
+		"""
+		tree = left._empty_like()
+		tree._tombstones = left._tombstones + right._tombstones
+		if not isinstance(pivot, tree._node_class):   # e.g. a plain AVLNode joined into a tree with aggregates
+			pivot = tree._node_class(pivot.key, pivot.value)
+		root = tree._join_roots(left.virtual_root.right, pivot, right.virtual_root.right)
+		min_node = left.min_node if left.virtual_root.right is not VIRTUAL_LEAF else pivot
+		max_node = right.max_node if right.virtual_root.right is not VIRTUAL_LEAF else pivot
+		tree._set_root(root, min_node, max_node)
+		left._set_root(VIRTUAL_LEAF, None, None)
+		right._set_root(VIRTUAL_LEAF, None, None)
+		left._tombstones = right._tombstones = 0
+		return tree
+
+	def split(self, key):
+		"""
+		Splits the tree into the items with keys smaller than key, and the items with keys greater than or equal to key.
+		The subtrees hanging off the search path of key are joined bottom-up, so the costs of the joins telescope.
+		self is emptied.
+		Time Complexity: O(log(n)).
+
+		@type key: int
+		@param key: the split key
+		@rtype: tuple of AVLTree
+		@returns: (left, right) - left has the keys < key, right has the keys >= key
+		"""
+		# search path of key, as (node, went_left) pairs:
+		path = []
+		node = self.virtual_root.right
+		found = None
+		while node is not VIRTUAL_LEAF:
+			if key == node.key:
+				found = node
+				break
+			went_left = key < node.key
+			path.append((node, went_left))
+			node = node.left if went_left else node.right
+
+		left_root = VIRTUAL_LEAF
+		right_root = VIRTUAL_LEAF
+		if found is not None:       # the key goes to the right tree
+			left_root = found.left
+			right_root = self._join_roots(VIRTUAL_LEAF, found, found.right)
+
+		# join the subtrees hanging off the path, from the bottom up:
+		for node, went_left in reversed(path):
+			if went_left:           # node and its right subtree are greater than key
+				right_root = self._join_roots(right_root, node, node.right)
+			else:                   # node and its left subtree are smaller than key
+				left_root = self._join_roots(node.left, node, left_root)
+
+		left = self._empty_like()
+		right = self._empty_like()
+		if left_root is not VIRTUAL_LEAF:
+			left._set_root(left_root, self.min_node, left.maximum(left_root))
+		if right_root is not VIRTUAL_LEAF:
+			right._set_root(right_root, right.minimum(right_root), self.max_node)
+		# the tombstones of a subtree are the nodes that are not counted by its size:
+		if self.lazy_delete:
+			left._tombstones = left_root.node_count - left_root.size
+			right._tombstones = right_root.node_count - right_root.size
+		self._set_root(VIRTUAL_LEAF, None, None)
+		return left, right
+
+	def _join_roots(self, left, pivot, right):
+		"""
+		Joins two detached subtrees and a pivot node, see join().
+		Time Complexity: O(|height(left) - height(right)| + 1).
+
+		@type left: AVLNode or VirtualLeaf
+		@param left: root of a subtree with keys smaller than pivot.key
+		@type pivot: AVLNode
+		@type right: AVLNode or VirtualLeaf
+		@param right: root of a subtree with keys greater than pivot.key
+		@rtype: AVLNode
+		@returns: the root of the joined subtree, its parent pointer is not set
+		"""
+		anchor = VirtualRoot()      # a temporary virtual root, so rotations can relink the top of the subtree
+
+		if left.height > right.height + 1:
+			# descend the right spine of left, to the first node not taller than right + 1:
+			anchor.right = left
+			left.parent = anchor
+			parent = anchor
+			node = left
+			while node.height > right.height + 1:
+				parent = node
+				node = node.right
+			pivot.left, pivot.right = node, right
+			parent.right = pivot
+
+		elif right.height > left.height + 1:
+			# descend the left spine of right, to the first node not taller than left + 1:
+			anchor.right = right
+			right.parent = anchor
+			parent = anchor
+			node = right
+			while node.height > left.height + 1:
+				parent = node
+				node = node.left
+			pivot.left, pivot.right = left, node
+			parent.left = pivot
+
+		else:
+			pivot.left, pivot.right = left, right
+			anchor.right = pivot
+			parent = anchor
+
+		# fix pointers around the pivot:
+		pivot.parent = parent
+		if pivot.left is not VIRTUAL_LEAF:
+			pivot.left.parent = pivot
+		if pivot.right is not VIRTUAL_LEAF:
+			pivot.right.parent = pivot
+		self._update_node(pivot)
+
+		# Travel up, update every node and rotate the criminals:
+		curr_node = parent
+		while curr_node is not anchor:
+			next_node = curr_node.parent
+			self._update_node(curr_node)
+			if curr_node.is_criminal():
+				self.balance(curr_node)
+			curr_node = next_node
+
+		return anchor.right
+
+	def _update_node(self, node):
+		"""
+		Recomputes the height, sizes and aggregates of node from its sons.
+
+		@type node: AVLNode
+		@rtype: None
+		"""
+		left = node.left
+		right = node.right
+		node.height = (left.height if left.height > right.height else right.height) + 1
+		node.size = left.size + right.size + node.live
+		if self.lazy_delete:
+			node.node_count = left.node_count + right.node_count + 1
+		if self._aggregate_specs:
+			self._update_aggregates(node)
+
+	def _empty_like(self):
+		"""
+		Returns a new empty tree with the same aggregates and delete mode as self.
+
+		@rtype: AVLTree
+		"""
+		return type(self)(self.aggregates, self.lazy_delete, self.tombstone_fraction)
+
+	def _set_root(self, root, min_node, max_node):
+		"""
+		Makes a detached subtree the content of self.
+
+		@type root: AVLNode or VirtualLeaf
+		@param root: the new real root
+		@type min_node: AVLNode or None
+		@param min_node: the node with the minimal key, None if root is a virtual leaf
+		@type max_node: AVLNode or None
+		@param max_node: the node with the maximal key, None if root is a virtual leaf
+		@rtype: None
+		"""
+		virtual_root = self.virtual_root
+		virtual_root.right = root
+		if root is not VIRTUAL_LEAF:
+			root.parent = virtual_root
+		virtual_root.size = root.size
+		self.min_node = min_node if min_node is not None else virtual_root
+		self.max_node = max_node if max_node is not None else virtual_root
+		self._version += 1
+
+	def rotate_left(self, node):
+		"""
+		Performs a left rotation.
+
+		@node type: AVLnode.
 		@param node: criminal node with a BF in {-2,2} or the left son of a criminal node.
 		@rtype: None.
 		"""
@@ -437,7 +1529,8 @@ class AVLTree(object):
 
 		# apply pointers for A <-> B.left:
 		A.right = B.left
-		A.right.parent = A
+		if A.right.is_real_node():
+			A.right.parent = A
 
 		# apply pointers for A <-> B:
 		B.left = A
@@ -448,8 +1541,16 @@ class AVLTree(object):
 		B.height = max(B.left.height, B.right.height) + 1
 
 		## Size ##
-		A.size = A.left.size + A.right.size + 1
-		B.size = B.left.size + B.right.size + 1
+		A.size = A.left.size + A.right.size + A.live
+		B.size = B.left.size + B.right.size + B.live
+		if self.lazy_delete:
+			A.node_count = A.left.node_count + A.right.node_count + 1
+			B.node_count = B.left.node_count + B.right.node_count + 1
+
+		## Aggregates ##
+		if self._aggregate_specs:
+			self._update_aggregates(A)
+			self._update_aggregates(B)
 
 	def rotate_right(self, node):
 		"""
@@ -472,7 +1573,8 @@ class AVLTree(object):
 
 		# apply pointers for A <-> B.right:
 		A.left = B.right
-		A.left.parent = A
+		if A.left.is_real_node():
+			A.left.parent = A
 
 		# apply pointers for A <-> B:
 		B.right = A
@@ -483,8 +1585,16 @@ class AVLTree(object):
 		B.height = max(B.left.height, B.right.height) + 1
 
 		## Size ##
-		A.size = A.left.size + A.right.size + 1
-		B.size = B.left.size + B.right.size + 1
+		A.size = A.left.size + A.right.size + A.live
+		B.size = B.left.size + B.right.size + B.live
+		if self.lazy_delete:
+			A.node_count = A.left.node_count + A.right.node_count + 1
+			B.node_count = B.left.node_count + B.right.node_count + 1
+
+		## Aggregates ##
+		if self._aggregate_specs:
+			self._update_aggregates(A)
+			self._update_aggregates(B)
 
 	def rotate_left_right(self, node):
 		"""
@@ -549,8 +1659,8 @@ class AVLTree(object):
 		@rtype: AVLnode.
 		@returns: successor of the current node.
 		"""
-		# Case 0: no successor (node is maximum)
-		if self.maximum() == node:
+		# Case 0: no successor (node is maximum), checked in O(1) using the cached maximum
+		if node is self.max_node:
 			return None
 		
 		# Case 1: node as a right son.
@@ -558,10 +1668,58 @@ class AVLTree(object):
 			return self.minimum(node.right)
 		
 		# Case 2: node does not have a right son.
-		while node.parent.right == node:  # climb up until you are no longer a right son.
+		while node.parent.right is node:  # climb up until you are no longer a right son.
 			node = node.parent
 		return node.parent
 
+	def predecessor(self, node):
+		"""
+		Return the predecessor node of a certain node.
+
+		@type node: AVLnode.
+		@param node: current node.
+		@rtype: AVLnode.
+		@returns: predecessor of the current node, None if node is the minimum.
+		"""
+		# Case 1: node as a left son.
+		if node.left.is_real_node():
+			return self.maximum(node.left)
+		
+		# Case 2: node does not have a left son.
+		while node.parent.left is node:   # climb up until you are no longer a left son.
+			node = node.parent
+		node = node.parent
+		if node is self.virtual_root:     # climbed from the minimum, the real root is the right son of the virtual root
+			return None
+		return node
+
+	def iter_from(self, key):
+		"""
+		Returns an in-order cursor positioned at the node with the smallest key greater than or equal to key.
+
+		@type key: int
+		@param key: the key to start from.
+		@rtype: AVLCursor
+		@returns: a cursor over self.
+		"""
+		cursor = AVLCursor(self)
+		cursor.seek(key)
+		return cursor
+
+	def __iter__(self):
+		"""
+		Iterates over the keys of the dictionary in ascending order.
+		Time Complexity: O(1) amortized per key.
+		"""
+		return self.keys()
+
+	def __reversed__(self):
+		"""
+		Iterates over the keys of the dictionary in descending order.
+		Time Complexity: O(1) amortized per key.
+		"""
+		return self.keys(reverse=True)
+
 	def minimum(self, node=None):
 		"""
 		Return the minimum of a subtree. 
@@ -582,9 +1740,9 @@ class AVLTree(object):
 			return None
 		
 		# find minumum:
-		while node.is_real_node(): # iterate until a virtual leaf node is encountered
+		while node.left.is_real_node(): # iterate until the left son is a virtual leaf node
 			node = node.left
-		return node.parent         # return the virtual leaf node parent
+		return node
 
 	def maximum(self, node=None):
 		"""
@@ -606,9 +1764,9 @@ class AVLTree(object):
 			return None
 		
 		# find minumum:
-		while node.is_real_node(): # iterate until a virtual leaf node is encountered
+		while node.right.is_real_node(): # iterate until the right son is a virtual leaf node
 			node = node.right
-		return node.parent         # return the virtual leaf node parent
+		return node
 
 #### Finger-tree modification functions #####
 
@@ -640,58 +1798,468 @@ class AVLTree(object):
 		while node.parent.key > key:
 			nodes_visited += 1
 			node = node.parent
+		if node.parent.key == key and not node.parent.live:   # the key is a tombstone (lazy delete mode)
+			return self._revive(node.parent, val, nodes_visited)
 		
 		# initialize counter for the new node rank:
 		new_node_rank = self.size() + 1
 
 		# find the parent of the new node, update the new node's rank
 		while node.is_real_node():
+			if key == node.key and not node.live:   # the key is a tombstone (lazy delete mode)
+				return self._revive(node, val, nodes_visited)
+			parent = node
 			if key < node.key:
-				new_node_rank -= (node.right.size + 1)
+				new_node_rank -= (node.right.size + node.live)
 				node = node.left
 			else:
 				node = node.right
 			nodes_visited += 1
-		parent = node.parent        # new parent found
-								    # nodes_visited is ready to be returned
+		# new parent found
+		# nodes_visited is ready to be returned
 
-		# insert the new node and fix pointers:
-		new_node = AVLNode(key, val)
-		new_node.parent = parent
-		if parent.left == node:
-			parent.left = new_node
-		else:
-			parent.right = new_node
+		# insert the new node, rebalance and update the maximum node:
+		rebalances = self._attach(parent, key, val, nodes_visited)[1]
 
-        # Travel up, for each node change the height and check if it's criminal.
-		# Count height change as +1, rotations as +1 or +2.
-		# Stop when reaching the virtual root, as size maintenance is done there.
+		sort_cost = rebalances + nodes_visited
+		substitutions = self.size() - new_node_rank
+		return sort_cost, substitutions
 
-		rebalances = 0 							   # initialize counter
-		curr_node = new_node.parent 			   # start from the new node
-		while curr_node.is_real_node():            # continue until the virtual root is reached (or encounter break command)
-			next_node = curr_node.parent           # save the next node before changing it
-			# Update height:
-			old_height = curr_node.height          # save old height
-			new_height = max(curr_node.left.height, curr_node.right.height) + 1  # update height
-			curr_node.height = new_height		   # update height
+	def insert_from_min(self, key, val):
+		"""
+		Inserst a new node into the dictionary with corresponding key and value, using the finger-tree algorithm from the minimum node.
+		The mirror image of insert_from_max, for input that is nearly sorted in descending order.
+		Time Complexity: O(log(n)), O(log(d)) amortized where d is the rank of key.
 
-			# Decide the next move:
-			if curr_node.is_criminal():            # [OBS 1]
-				rebalances += self.balance(curr_node)
-			else: 
-				curr_node.size += 1                # update size
-				if new_height != old_height:       # [OBS 3]
-					rebalances += 1				   # count the number of height changes
-			curr_node = next_node		           # continue to the next node		
-		
-		# Update Virtual Root Size & Height:
-		self.virtual_root.size += 1
+		@type key: int.
+		@pre: key currently does not appear in the dictionary.
+		@param key: key of item that is to be inserted to self.
+		@type val: string.
+		@param val: the value of the item.
 
-		# Update the maximum node if needed:
-		if new_node.key > self.max_node.key:
-			self.max_node = new_node
+		@rtype: tuple of integers.
+		@returns: a tuple with the sort_cost and substitutions --> (sort_cost, substitutions)
+				  sort_cost: the number of rebalancing operations due to AVL rebalancing + number of nodes visited when searching for the insertion point.
+				  substitutions: the number of keys in the dictionary greater than key.
+		"""
+		# if the tree is empty:
+		if not self.virtual_root.right.is_real_node():
+			return self.insert(key, val), 0
+
+		# Start from the minimum node
+		# iterate until we reach the left son of the first node that is greater than the key
+		node = self.min_node
+		nodes_visited = 0
+		while node.parent is not self.virtual_root and node.parent.key < key:
+			nodes_visited += 1
+			node = node.parent
+		if node.parent.key == key and not node.parent.live:   # the key is a tombstone (lazy delete mode)
+			return self._revive(node.parent, val, nodes_visited)
+
+		# initialize counter for the new node rank, all smaller keys are in the subtree of node:
+		new_node_rank = 1
+
+		# find the parent of the new node, update the new node's rank
+		while node.is_real_node():
+			if key == node.key and not node.live:   # the key is a tombstone (lazy delete mode)
+				return self._revive(node, val, nodes_visited)
+			parent = node
+			if key < node.key:
+				node = node.left
+			else:
+				new_node_rank += (node.left.size + node.live)
+				node = node.right
+			nodes_visited += 1
+
+		# insert the new node, rebalance and update the minimum node:
+		rebalances = self._attach(parent, key, val, nodes_visited)[1]
 
 		sort_cost = rebalances + nodes_visited
 		substitutions = self.size() - new_node_rank
-		return sort_cost, substitutions
\ No newline at end of file
+		return sort_cost, substitutions
+
+	def _revive(self, node, val, nodes_visited):
+		"""
+		Revives a tombstone found by a finger insertion.
+
+		@type node: AVLNode
+		@param node: a tombstone with the inserted key
+		@rtype: tuple of integers.
+		@returns: (sort_cost, substitutions) of the insertion, as in insert_from_max.
+		"""
+		self._set_value(node, val)
+		return nodes_visited, self.size() - self.rank(node)
+
+	def insert_near(self, finger, key, val):
+		"""
+		Inserst a new node into the dictionary with corresponding key and value, using the finger-tree algorithm from any node.
+		The search climbs from the finger and descends again, see _finger_search.
+		Time Complexity: O(log(d)) amortized for the search and the rebalancing, where d is the rank distance between finger and key.
+		The substitutions are counted by a rank walk, in O(log(n)), which is not part of sort_cost.
+
+		@type finger: AVLNode.
+		@param finger: a node of self, e.g. the previously inserted node, self.min_node or self.max_node.
+		@type key: int.
+		@param key: key of item that is to be inserted to self.
+		@type val: string.
+		@param val: the value of the item.
+
+		@rtype: tuple of integers.
+		@returns: a tuple with the sort_cost and substitutions --> (sort_cost, substitutions), as in insert_from_max.
+				  If key already appears in the dictionary, its value is switched and substitutions is 0.
+		"""
+		# if the tree is empty:
+		if not self.virtual_root.right.is_real_node():
+			return self.insert(key, val), 0
+
+		node, parent, nodes_visited = self._finger_search(finger, key)
+		if node is not VIRTUAL_LEAF:   # the key appears in the tree
+			self._set_value(node, val)
+			return nodes_visited, 0
+
+		new_node, rebalances = self._attach(parent, key, val, nodes_visited)
+		sort_cost = rebalances + nodes_visited
+		substitutions = self.size() - self.rank(new_node)
+		return sort_cost, substitutions
+
+	def search_near(self, finger, key):
+		"""
+		searches for a node in the dictionary corresponding to the key, starting from a finger node.
+		Time Complexity: O(log(d)), where d is the rank distance between finger and key.
+
+		@type finger: AVLNode
+		@param finger: a node of self.
+		@type key: int
+		@param key: a key to be searched
+		@rtype: AVLNode
+		@returns: node corresponding to key, None if key does not appear in the dictionary
+		"""
+		if finger is None or not finger.is_real_node():
+			return self.search(key)
+		node = self._finger_search(finger, key)[0]
+		if node is VIRTUAL_LEAF or not node.live:   # tombstones are not returned, as in search
+			return None
+		return node
+
+	def _finger_search(self, finger, key):
+		"""
+		Searches for key starting from a finger node instead of the root.
+		Climbs from the finger to the lowest ancestor whose subtree spans key, then descends from it.
+		Time Complexity: O(log(d)), where d is the rank distance between finger and key.
+
+		@type finger: AVLNode
+		@param finger: a real node of self.
+		@type key: int
+		@rtype: tuple
+		@returns: (node, parent, nodes_visited) - node holds key, or is the virtual leaf son of parent where key belongs.
+		"""
+		virtual_root = self.virtual_root
+		node = finger
+		nodes_visited = 0
+
+		# climb while the parent does not bound the subtree from the side of key:
+		if key > finger.key:
+			while node.parent is not virtual_root and node.parent.key <= key:
+				node = node.parent
+				nodes_visited += 1
+		elif key < finger.key:
+			while node.parent.key >= key:    # the virtual root key is -inf
+				node = node.parent
+				nodes_visited += 1
+
+		# descend:
+		parent = node.parent
+		while node is not VIRTUAL_LEAF:
+			if key == node.key:
+				break
+			parent = node
+			if key < node.key:
+				node = node.left
+			else:
+				node = node.right
+			nodes_visited += 1
+		return node, parent, nodes_visited
+
+#### Batch modification functions #####
+
+	# batches of at least this fraction of the tree size are merged with the tree and rebuilt in O(n + m)
+	BATCH_REBUILD_FRACTION = 0.5
+
+	def insert_many(self, items):
+		"""
+		Inserts a batch of items into the dictionary.
+		The batch is sorted, and each key is searched from the previously inserted node (a finger),
+		so consecutive keys that are close in the tree cost O(log(d)) instead of a descent from the root.
+		A batch that is large relative to the tree is merged with the items of the tree, and the tree is rebuilt.
+		If a key appears more than once, the last value is kept.
+		Time Complexity: O(m*log(n/m + 1) + m*log(m)), or O(n + m*log(m)) when rebuilding.
+
+		@type items: iterable of tuples (key, value)
+		@param items: the items to insert, in any order.
+		@rtype: int
+		@returns: the total number of rebalancing operations due to AVL rebalancing (0 if the tree was rebuilt)
+		"""
+		batch = sorted(items, key=lambda item: item[0])   # stable, so the last value of a key comes last
+		if not batch:
+			return 0
+		if len(batch) >= self.BATCH_REBUILD_FRACTION * self.size():
+			self._merge_rebuild(batch, ())
+			return 0
+
+		rebalances = 0
+		finger = self.virtual_root.right
+		for key, val in batch:
+			node, parent, nodes_visited = self._finger_search(finger, key)
+			if node is not VIRTUAL_LEAF:   # the key appears in the tree
+				self._set_value(node, val)
+				finger = node
+			else:
+				finger, node_rebalances = self._attach(parent, key, val, nodes_visited)
+				rebalances += node_rebalances
+		return rebalances
+
+	def delete_many(self, keys):
+		"""
+		Deletes a batch of keys from the dictionary, keys that do not appear in the dictionary are ignored.
+		As in insert_many, the keys are sorted and searched from a finger next to the previous deletion,
+		and a batch that is large relative to the tree is removed by rebuilding the tree from the remaining items.
+		Time Complexity: O(m*log(n/m + 1) + m*log(m)), or O(n + m*log(m)) when rebuilding.
+
+		@type keys: iterable
+		@param keys: the keys to delete, in any order.
+		@rtype: int
+		@returns: the total number of rebalancing operations due to AVL rebalancing (0 if the tree was rebuilt)
+		"""
+		batch = sorted(keys)
+		if not batch or self.virtual_root.right is VIRTUAL_LEAF:
+			return 0
+		if len(batch) >= self.BATCH_REBUILD_FRACTION * self.size():
+			self._merge_rebuild((), batch)
+			return 0
+
+		virtual_root = self.virtual_root
+		rebalances = 0
+		finger = virtual_root.right
+		for key in batch:
+			node = self._finger_search(finger, key)[0]
+			if node is VIRTUAL_LEAF:
+				continue
+			# the next finger is a neighbour of node that stays in the tree:
+			if node.left is not VIRTUAL_LEAF and node.right is not VIRTUAL_LEAF:
+				finger = node                  # node takes the key of its successor
+			else:
+				finger = node.parent
+			rebalances += self.delete(node)
+			if finger is virtual_root:
+				finger = virtual_root.right
+				if finger is VIRTUAL_LEAF:     # the tree is empty
+					break
+		return rebalances
+
+	def _merge_rebuild(self, insert_items, delete_keys):
+		"""
+		Merges sorted batches of items to insert and keys to delete with the items of the tree,
+		and rebuilds a perfectly balanced tree. Existing nodes are reused, and tombstones are dropped.
+		Time Complexity: O(n + m).
+
+		@type insert_items: list of tuples (key, value)
+		@pre: sorted by key, stable for equal keys
+		@type delete_keys: list
+		@pre: sorted
+		@rtype: None
+		"""
+		nodes = []
+		existing = AVLCursor(self, self.minimum(), skip_tombstones=False)
+		node = existing.node
+		i = j = 0
+		while node is not None or i < len(insert_items):
+			if node is not None and (i == len(insert_items) or node.key < insert_items[i][0]):
+				curr_node = node
+				node = existing.next()
+			else:
+				key, val = insert_items[i]
+				i += 1
+				if node is not None and node.key == key:
+					node.value = val
+					if not node.live:
+						node.live = True
+					curr_node = node
+					node = existing.next()
+				elif nodes and nodes[-1].key == key:   # repeated key in the batch
+					nodes[-1].value = val
+					continue
+				else:
+					curr_node = self._node_class(key, val)
+			# skip tombstones and deleted keys:
+			if not curr_node.live:
+				continue
+			while j < len(delete_keys) and delete_keys[j] < curr_node.key:
+				j += 1
+			if j < len(delete_keys) and delete_keys[j] == curr_node.key:
+				continue
+			nodes.append(curr_node)
+		self._build_balanced(nodes)
+
+#### Batch query functions #####
+
+	def search_many(self, keys, default=None):
+		"""
+		Searches for a batch of keys.
+		If the sorted snapshot of the tree is up to date (or the batch is large enough to justify building it),
+		the keys are located with np.searchsorted. Otherwise the sorted batch is searched in one coordinated traversal.
+		Time Complexity: O(m*log(n)) with the snapshot, O(m*log(n/m + 1) + m*log(m)) by traversal.
+
+		@type keys: array-like
+		@param keys: the keys to search for.
+		@param default: the value returned for keys that do not appear in the dictionary.
+		@rtype: numpy.ndarray
+		@returns: object array with the value of every key, aligned with keys.
+		"""
+		_require_numpy()
+		queries = np.asarray(keys)
+		result = np.empty(len(queries), dtype=object)
+		snapshot = self._snapshot_for(len(queries))
+		if snapshot is not None:
+			positions, found = _locate(snapshot.keys, queries)
+			result.fill(default)
+			result[found] = snapshot.values[positions[found]]
+			return result
+
+		order = np.argsort(queries, kind='stable')
+		nodes = self._walk_sorted_keys(queries[order].tolist())[0]
+		for position, node in zip(order.tolist(), nodes):
+			result[position] = default if node is None else node.value
+		return result
+
+	def rank_many(self, keys):
+		"""
+		Computes the rank of a batch of keys, as search_many.
+
+		@type keys: array-like
+		@param keys: the keys to rank.
+		@rtype: numpy.ndarray
+		@returns: int64 array with the rank of every key, 0 for keys that do not appear in the dictionary.
+		"""
+		_require_numpy()
+		queries = np.asarray(keys)
+		snapshot = self._snapshot_for(len(queries))
+		if snapshot is not None:
+			positions, found = _locate(snapshot.keys, queries)
+			return np.where(found, positions + 1, 0).astype(np.int64)
+
+		order = np.argsort(queries, kind='stable')
+		ranks = np.zeros(len(queries), dtype=np.int64)
+		ranks[order] = self._walk_sorted_keys(queries[order].tolist())[1]
+		return ranks
+
+	def select_many(self, indices):
+		"""
+		Finds the items of a batch of ranks, as search_many.
+
+		@type indices: array-like
+		@pre: 1 <= i <= self.size() for every i in indices
+		@param indices: the ranks to select.
+		@rtype: numpy.ndarray
+		@returns: array with the key of every rank, aligned with indices.
+		"""
+		_require_numpy()
+		queries = np.asarray(indices, dtype=np.int64)
+		snapshot = self._snapshot_for(len(queries))
+		if snapshot is not None:
+			return snapshot.keys[queries - 1]
+
+		order = np.argsort(queries, kind='stable')
+		nodes = self._walk_sorted_ranks(queries[order].tolist())
+		keys = [None] * len(queries)
+		for position, node in zip(order.tolist(), nodes):
+			keys[position] = node.key
+		return np.array(keys)
+
+	def _snapshot_for(self, batch_size):
+		"""
+		Returns the snapshot of the tree if it is up to date,
+		or if a batch of batch_size queries is large enough to pay for rebuilding it (m*log(n) >= n).
+
+		@rtype: AVLSnapshot or None
+		"""
+		snapshot = self._snapshot
+		if snapshot is None or snapshot.version != self._version:
+			n = self.size()
+			if batch_size * max(n.bit_length(), 1) < n:
+				return None
+		return self.snapshot()
+
+	def _walk_sorted_keys(self, keys):
+		"""
+		Searches a sorted list of keys in one coordinated traversal.
+		Each node is visited once for all the queries in its key range, which are split between its sons by bisection.
+		Time Complexity: O(m*log(n/m + 1) + m*log(m)).
+
+		@type keys: list
+		@pre: keys is sorted
+		@rtype: tuple of lists
+		@returns: (nodes, ranks) aligned with keys, None and 0 for keys that do not appear in the dictionary.
+		"""
+		nodes = [None] * len(keys)
+		ranks = [0] * len(keys)
+		stack = [(self.virtual_root.right, 0, len(keys), 0)]   # (subtree root, queries lo:hi, number of items left of the subtree)
+		while stack:
+			node, lo, hi, offset = stack.pop()
+			if node is VIRTUAL_LEAF or lo >= hi:
+				continue
+			i = bisect_left(keys, node.key, lo, hi)
+			j = bisect_right(keys, node.key, i, hi)
+			if node.live:
+				rank = offset + node.left.size + 1
+				for q in range(i, j):
+					nodes[q] = node
+					ranks[q] = rank
+			stack.append((node.left, lo, i, offset))
+			stack.append((node.right, j, hi, offset + node.left.size + node.live))
+		return nodes, ranks
+
+	def _walk_sorted_ranks(self, ranks):
+		"""
+		Selects a sorted list of ranks in one coordinated traversal, as _walk_sorted_keys.
+
+		@type ranks: list of int
+		@pre: ranks is sorted, 1 <= i <= self.size() for every i in ranks
+		@rtype: list of AVLNode
+		@returns: the nodes of the ranks, aligned with ranks.
+		"""
+		nodes = [None] * len(ranks)
+		stack = [(self.virtual_root.right, 0, len(ranks), 0)]  # (subtree root, queries lo:hi, number of items left of the subtree)
+		while stack:
+			node, lo, hi, offset = stack.pop()
+			if node is VIRTUAL_LEAF or lo >= hi:
+				continue
+			node_rank = offset + node.left.size + 1
+			i = bisect_left(ranks, node_rank, lo, hi)
+			j = bisect_right(ranks, node_rank, i, hi) if node.live else i
+			for q in range(i, j):
+				nodes[q] = node
+			stack.append((node.left, lo, i, offset))
+			stack.append((node.right, j, hi, offset + node.left.size + node.live))
+		return nodes
+
+
+def _require_numpy():
+	"""
+	Raises an ImportError if numpy, needed by the batch query functions, is not installed.
+	"""
+	if np is None:
+		raise ImportError('numpy is required by AVLTree.search_many, rank_many and select_many')
+
+def _locate(sorted_keys, queries):
+	"""
+	Locates queries in a sorted keys array with np.searchsorted.
+
+	@rtype: tuple of numpy.ndarray
+	@returns: (positions, found) - the index of every query in sorted_keys, and whether it is there.
+	"""
+	positions = np.searchsorted(sorted_keys, queries)
+	if len(sorted_keys) == 0:
+		return positions, np.zeros(len(queries), dtype=bool)
+	clipped = np.minimum(positions, len(sorted_keys) - 1)
+	found = (positions < len(sorted_keys)) & (sorted_keys[clipped] == queries)
+	return clipped, found
@@ -0,0 +1,472 @@
+# Description: This file contains an array-backed (struct-of-arrays) implementation of the AVL tree data structure.
+# Tomer Nadiv & Ron Ben Harosh 2024
+
+from array import array
+
+"""
+A class implementing an AVL tree over preallocated columns.
+"""
+class ArrayAVLTree(object):
+	"""
+	An AVL tree for numeric keys, with the same public methods as AVLTree.
+	Instead of node objects, every field is a column (an array.array) and a node is an integer index into the columns.
+	Index 0 (NIL) plays the role of the virtual leaf - height -1 and size 0 - and is the parent of the root.
+	Deleted indices are kept in a free list (linked through the left column) and reused,
+	and the columns grow geometrically when they are full.
+
+	@type capacity: int
+	@param capacity: initial number of nodes the columns can hold.
+	@type key_type: str
+	@param key_type: array typecode of the keys, e.g. 'q' (64-bit int) or 'd' (double).
+	@type value_type: str or None
+	@param value_type: array typecode of the values, None to store arbitrary objects in a list.
+	"""
+
+	NIL = 0
+
+	def __init__(self, capacity=16, key_type='q', value_type='q'):
+		self.key_type = key_type
+		self.value_type = value_type
+		capacity = max(capacity, 1) + 1   # index 0 is NIL
+
+		self.keys = array(key_type, bytes(capacity * array(key_type).itemsize))
+		if value_type is None:
+			self.values = [None] * capacity
+		else:
+			self.values = array(value_type, bytes(capacity * array(value_type).itemsize))
+		self.left = array('q', bytes(capacity * 8))
+		self.right = array('q', bytes(capacity * 8))
+		self.parent = array('q', bytes(capacity * 8))
+		self.height = array('b', bytes(capacity))
+		self.sizes = array('q', bytes(capacity * 8))
+		self.height[0] = -1               # NIL is a virtual leaf
+
+		self.root = 0
+		self.max_node = 0                 # NIL while the tree is empty
+		self.free = 0                     # head of the free list, NIL if empty
+		self.top = 1                      # smallest index never allocated
+
+	def __repr__(self):
+		return '-Array AVL Tree-\n size: %d\n capacity: %d' % (self.size(), len(self.keys) - 1)
+
+	def _grow(self):
+		"""
+		Doubles the capacity of every column.
+		Time Complexity: O(n), amortized O(1) per allocation.
+
+		@rtype: None
+		"""
+		extra = len(self.keys)
+		for column in (self.keys, self.left, self.right, self.parent, self.height, self.sizes):
+			column.frombytes(bytes(extra * column.itemsize))
+		if self.value_type is None:
+			self.values.extend([None] * extra)
+		else:
+			self.values.frombytes(bytes(extra * self.values.itemsize))
+
+	def _new_node(self, key, val, parent):
+		"""
+		Allocates a node from the free list, or from the end of the columns.
+
+		@rtype: int
+		@returns: the index of the new node
+		"""
+		node = self.free
+		if node:
+			self.free = self.left[node]
+		else:
+			if self.top == len(self.keys):
+				self._grow()
+			node = self.top
+			self.top += 1
+		self.keys[node] = key
+		self.values[node] = val
+		self.left[node] = 0
+		self.right[node] = 0
+		self.parent[node] = parent
+		self.height[node] = 0
+		self.sizes[node] = 1
+		return node
+
+	def _free_node(self, node):
+		"""
+		Returns a node index to the free list.
+
+		@rtype: None
+		"""
+		if self.value_type is None:
+			self.values[node] = None   # release the object
+		self.left[node] = self.free
+		self.free = node
+
+	def get_root(self):
+		"""
+		returns the root of the tree representing the dictionary
+
+		@rtype: int
+		@returns: the root index, None if the dictionary is empty
+		"""
+		return self.root if self.root else None
+
+	def get_key(self, node):
+		"""
+		@type node: int
+		@rtype: number
+		@returns: the key of node
+		"""
+		return self.keys[node]
+
+	def get_value(self, node):
+		"""
+		@type node: int
+		@returns: the value of node
+		"""
+		return self.values[node]
+
+	def size(self):
+		"""
+		returns the number of items in dictionary
+
+		@rtype: int
+		@returns: the number of items in dictionary
+		"""
+		return self.sizes[self.root]
+
+	def search(self, key):
+		"""
+		searches for a node in the dictionary corresponding to the key.
+		Time Complexity: O(log(n)).
+
+		@type key: int
+		@param key: a key to be searched
+		@rtype: int
+		@returns: index of the node corresponding to key, None if key does not appear in the dictionary
+		"""
+		keys, left, right = self.keys, self.left, self.right
+		node = self.root
+		while node:
+			node_key = keys[node]
+			if key == node_key:
+				return node
+			node = left[node] if key < node_key else right[node]
+		return None
+
+	def insert(self, key, val):
+		"""
+		inserts a new node into the dictionary with corresponding key and value
+		Time Complexity: O(log(n)).
+
+		@type key: int
+		@param key: key of item that is to be inserted to self
+		@param val: the value of the item
+		@rtype: int
+		@returns: the number of rebalancing operation due to AVL rebalancing
+		"""
+		keys, left, right = self.keys, self.left, self.right
+		parent = 0
+		node = self.root
+		while node:
+			node_key = keys[node]
+			if key == node_key:          # the key appears in the tree
+				self.values[node] = val  # switch the value
+				return 0
+			parent = node
+			node = left[node] if key < node_key else right[node]
+		return self._attach(parent, key, val)
+
+	def _attach(self, parent, key, val):
+		"""
+		Creates a new node as a son of parent, rebalances the tree and updates the maximum node.
+
+		@type parent: int
+		@param parent: the node whose NIL son is replaced by the new node, NIL if the tree is empty
+		@rtype: int
+		@returns: the number of rebalancing operation due to AVL rebalancing
+		"""
+		new_node = self._new_node(key, val, parent)
+		if not parent:
+			self.root = new_node
+		elif key < self.keys[parent]:
+			self.left[parent] = new_node
+		else:
+			self.right[parent] = new_node
+
+		# Travel up, as in AVLTree: stop updating heights once a height is unchanged or after a rotation.
+		left, right, parents, height, sizes = self.left, self.right, self.parent, self.height, self.sizes
+		rebalances = 0
+		node = parent
+		while node:
+			next_node = parents[node]
+			left_height = height[left[node]]
+			right_height = height[right[node]]
+			new_height = (left_height if left_height > right_height else right_height) + 1
+			bf = left_height - right_height
+			if bf > 1 or bf < -1:
+				height[node] = new_height
+				rebalances += self._balance(node)
+				node = next_node
+				break
+			sizes[node] += 1
+			if new_height == height[node]:
+				node = next_node
+				break
+			height[node] = new_height
+			rebalances += 1
+			node = next_node
+
+		# Heights above are unchanged, only update the sizes:
+		while node:
+			sizes[node] += 1
+			node = parents[node]
+
+		# Update the maximum node if needed:
+		if not self.max_node or key > self.keys[self.max_node]:
+			self.max_node = new_node
+		return rebalances
+
+	def delete(self, node):
+		"""
+		deletes node from the dictionary
+		Time Complexity: O(log(n)).
+
+		@type node: int
+		@pre: node is the index of a node in self
+		@rtype: int
+		@returns: the number of rebalancing operation due to AVL rebalancing
+		"""
+		left, right, parents, height, sizes = self.left, self.right, self.parent, self.height, self.sizes
+
+		# Case 2: node has exactly 2 children, replace it inplace by its successor:
+		if left[node] and right[node]:
+			successor = self.successor(node)
+			self.keys[node] = self.keys[successor]
+			self.values[node] = self.values[successor]
+			node = successor
+
+		# Case 1: node has less than 2 children:
+		child = left[node] if left[node] else right[node]
+		parent = parents[node]
+		if not parent:
+			self.root = child
+		elif left[parent] == node:
+			left[parent] = child
+		else:
+			right[parent] = child
+		if child:
+			parents[child] = parent
+
+		# Update the maximum node if needed, the new maximum is the predecessor of node:
+		if node == self.max_node:
+			self.max_node = child if child else parent
+		self._free_node(node)
+
+		# Travel up, update sizes and heights, rotate the criminals:
+		rebalances = 0
+		curr_node = parent
+		while curr_node:
+			next_node = parents[curr_node]
+			sizes[curr_node] -= 1
+			old_height = height[curr_node]
+			left_height = height[left[curr_node]]
+			right_height = height[right[curr_node]]
+			new_height = (left_height if left_height > right_height else right_height) + 1
+			height[curr_node] = new_height
+			bf = left_height - right_height
+			if bf > 1 or bf < -1:
+				rebalances += self._balance(curr_node)
+			elif new_height != old_height:
+				rebalances += 1
+			curr_node = next_node
+		return rebalances
+
+	def avl_to_array(self):
+		"""
+		Returns an array representing the dictionary.
+		Iterative in-order walk with an explicit stack.
+		Time Complexity: O(n).
+
+		@rtype: list
+		@returns: a sorted list according to key of tuples (key, value) representing the data structure
+		"""
+		keys, values, left, right = self.keys, self.values, self.left, self.right
+		result = []
+		stack = []
+		node = self.root
+		while stack or node:
+			while node:
+				stack.append(node)
+				node = left[node]
+			node = stack.pop()
+			result.append((keys[node], values[node]))
+			node = right[node]
+		return result
+
+	def rank(self, node):
+		"""
+		compute the rank of node in the dictionary
+		Time Complexity: O(log(n)).
+
+		@type node: int
+		@pre: node is in self
+		@rtype: int
+		@returns: the rank of node in self
+		"""
+		left, right, parents, sizes = self.left, self.right, self.parent, self.sizes
+		cnt = sizes[left[node]] + 1
+		parent = parents[node]
+		while parent:
+			if right[parent] == node:
+				cnt += sizes[left[parent]] + 1
+			node = parent
+			parent = parents[node]
+		return cnt
+
+	def select(self, i):
+		"""
+		finds the i'th smallest item (according to keys) in the dictionary
+		Time Complexity: O(log(n)).
+
+		@type i: int
+		@pre: 1 <= i <= self.size()
+		@rtype: int
+		@returns: the index of the node of rank i in self
+		"""
+		left, right, sizes = self.left, self.right, self.sizes
+		node = self.root
+		while True:
+			left_size = sizes[left[node]]
+			if i <= left_size:
+				node = left[node]
+			elif i == left_size + 1:
+				return node
+			else:
+				i -= left_size + 1
+				node = right[node]
+
+	def successor(self, node):
+		"""
+		Return the successor node of a certain node.
+
+		@type node: int
+		@rtype: int
+		@returns: successor of node, None if node is the maximum.
+		"""
+		if node == self.max_node:
+			return None
+		left, right, parents = self.left, self.right, self.parent
+		if right[node]:
+			node = right[node]
+			while left[node]:
+				node = left[node]
+			return node
+		while right[parents[node]] == node:
+			node = parents[node]
+		return parents[node]
+
+	def _rotate(self, a, to_left):
+		"""
+		Performs a left rotation (to_left=True) or a right rotation on node a.
+
+		@rtype: None
+		"""
+		left, right, parents, height, sizes = self.left, self.right, self.parent, self.height, self.sizes
+		if to_left:
+			up, down = right, left        # b = right son of a, b.left moves to a.right
+		else:
+			up, down = left, right        # b = left son of a, b.right moves to a.left
+		b = up[a]
+		p = parents[a]
+
+		# apply pointers for a.parent <-> b:
+		if not p:
+			self.root = b
+		elif left[p] == a:
+			left[p] = b
+		else:
+			right[p] = b
+		parents[b] = p
+
+		# apply pointers for a <-> inner son of b:
+		inner = down[b]
+		up[a] = inner
+		if inner:
+			parents[inner] = a
+
+		# apply pointers for a <-> b:
+		down[b] = a
+		parents[a] = b
+
+		# height and size:
+		for node in (a, b):
+			lh = height[left[node]]
+			rh = height[right[node]]
+			height[node] = (lh if lh > rh else rh) + 1
+			sizes[node] = sizes[left[node]] + sizes[right[node]] + 1
+
+	def _balance(self, node):
+		"""
+		Fixes a criminal node, as AVLTree.balance.
+
+		@rtype: int
+		@returns: number of rotations performed {0,1,2}.
+		"""
+		left, right, height = self.left, self.right, self.height
+		bf = height[left[node]] - height[right[node]]
+		if bf == -2:
+			child = right[node]
+			if height[left[child]] - height[right[child]] == 1:
+				self._rotate(child, False)    # right left rotation
+				self._rotate(node, True)
+				return 2
+			self._rotate(node, True)          # left rotation
+			return 1
+		if bf == 2:
+			child = left[node]
+			if height[left[child]] - height[right[child]] == -1:
+				self._rotate(child, True)     # left right rotation
+				self._rotate(node, False)
+				return 2
+			self._rotate(node, False)         # right rotation
+			return 1
+		return 0
+
+	def insert_from_max(self, key, val):
+		"""
+		Inserst a new node into the dictionary with corresponding key and value, using the finger-tree algorithm.
+		Time Complexity: O(log(n)).
+
+		@type key: int.
+		@pre: key currently does not appear in the dictionary.
+		@param key: key of item that is to be inserted to self.
+		@param val: the value of the item.
+		@rtype: tuple of integers.
+		@returns: (sort_cost, substitutions), as AVLTree.insert_from_max.
+		"""
+		# if the tree is empty:
+		if not self.root:
+			return self.insert(key, val), 0
+
+		keys, left, right, parents, sizes = self.keys, self.left, self.right, self.parent, self.sizes
+
+		# climb from the maximum node while the parent is greater than the key (the root has parent NIL):
+		node = self.max_node
+		nodes_visited = 0
+		while parents[node] and keys[parents[node]] > key:
+			nodes_visited += 1
+			node = parents[node]
+
+		# find the parent of the new node, update the new node's rank:
+		new_node_rank = self.size() + 1
+		while node:
+			parent = node
+			if key < keys[node]:
+				new_node_rank -= sizes[right[node]] + 1
+				node = left[node]
+			else:
+				node = right[node]
+			nodes_visited += 1
+
+		rebalances = self._attach(parent, key, val)
+		sort_cost = rebalances + nodes_visited
+		substitutions = self.size() - new_node_rank
+		return sort_cost, substitutions
@@ -0,0 +1,329 @@
+# Description: This file contains a thread-safe wrapper of the AVL tree data structure.
+# Tomer Nadiv & Ron Ben Harosh 2024
+
+import queue
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from AVLTree import AVLTree
+from PersistentAVLTree import PersistentAVLTree
+
+"""
+A class implementing a readers-writer lock.
+"""
+class RWLock(object):
+	"""
+	Any number of readers may hold the lock together, a writer holds it alone.
+	Writers are preferred - once a writer waits, new readers wait for it, so writers do not starve.
+	"""
+
+	def __init__(self):
+		self._cond = threading.Condition(threading.Lock())
+		self._readers = 0           # number of readers holding the lock
+		self._writer = False        # whether a writer holds the lock
+		self._waiting_writers = 0
+
+	def acquire_read(self):
+		with self._cond:
+			while self._writer or self._waiting_writers:
+				self._cond.wait()
+			self._readers += 1
+
+	def release_read(self):
+		with self._cond:
+			self._readers -= 1
+			if self._readers == 0:
+				self._cond.notify_all()
+
+	def acquire_write(self):
+		with self._cond:
+			self._waiting_writers += 1
+			while self._writer or self._readers:
+				self._cond.wait()
+			self._waiting_writers -= 1
+			self._writer = True
+
+	def release_write(self):
+		with self._cond:
+			self._writer = False
+			self._cond.notify_all()
+
+	@contextmanager
+	def read_locked(self):
+		self.acquire_read()
+		try:
+			yield
+		finally:
+			self.release_read()
+
+	@contextmanager
+	def write_locked(self):
+		self.acquire_write()
+		try:
+			yield
+		finally:
+			self.release_write()
+
+
+"""
+A class implementing a thread-safe AVL tree.
+"""
+class ConcurrentAVLTree(object):
+	"""
+	A dictionary shared by many threads.
+	insert and delete only enqueue the change and return a Future. A single writer thread drains the queue,
+	coalesces the pending changes into one batch (the last change of every key wins) and applies it:
+	to an AVLTree, under the write side of a readers-writer lock, and by path copying to a PersistentAVLTree version,
+	which is then published with a single reference assignment.
+	search, rank, select and the range queries read the published version without any lock, so they never wait for writers.
+	The full AVLTree (e.g. for max_range or aggregate) is available to readers holding the read lock, see read().
+	Reads observe the changes of a write once its Future is done (or after flush()).
+
+	@type tree: AVLTree or None
+	@param tree: the initial content, owned by the wrapper from now on (None for an empty dictionary)
+	@type max_batch: int
+	@param max_batch: the maximal number of queued changes applied as one batch
+	"""
+
+	_CLOSE = object()   # queued by close() to stop the writer thread
+
+	def __init__(self, tree=None, max_batch=1024):
+		self._tree = tree if tree is not None else AVLTree()
+		self._lock = RWLock()
+		self._published = PersistentAVLTree.from_sorted(self._tree.items())
+		self.max_batch = max_batch
+		self._queue = queue.Queue()
+		self._closed = False                   # set by close(), under _close_lock, so no change is queued after _CLOSE
+		self._close_lock = threading.Lock()
+		self._writer = threading.Thread(target=self._writer_loop, name='ConcurrentAVLTree-writer', daemon=True)
+		self._writer.start()
+
+	def __repr__(self):
+		return '-Concurrent AVL Tree-\n size: %d\n pending writes: %d' % (self.size(), self._queue.qsize())
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc, tb):
+		self.close()
+
+#### Write functions #####
+
+	def insert(self, key, val):
+		"""
+		queues the insertion of an item (or the replacement of its value, if key already appears)
+
+		@type key: int
+		@type val: string
+		@rtype: concurrent.futures.Future
+		@returns: a future, done once the change is visible to readers
+		"""
+		return self._submit(key, val, False)
+
+	def delete(self, key):
+		"""
+		queues the deletion of key, which is ignored if key does not appear in the dictionary
+
+		@type key: int
+		@rtype: concurrent.futures.Future
+		@returns: a future, done once the change is visible to readers
+		"""
+		return self._submit(key, None, True)
+
+	def flush(self):
+		"""
+		Waits until every change queued so far is applied and published.
+
+		@rtype: None
+		"""
+		self._queue.join()
+
+	def close(self):
+		"""
+		Applies the queued changes and stops the writer thread. Reads remain possible after closing.
+
+		@rtype: None
+		"""
+		with self._close_lock:
+			if not self._closed:
+				self._closed = True
+				self._queue.put(self._CLOSE)
+		self._writer.join()
+
+	def _submit(self, key, val, is_delete):
+		"""
+		Queues a change for the writer thread.
+
+		@rtype: concurrent.futures.Future
+		"""
+		future = Future()
+		with self._close_lock:
+			if self._closed:
+				raise RuntimeError('ConcurrentAVLTree is closed')
+			self._queue.put((key, val, is_delete, future))
+		return future
+
+	def _writer_loop(self):
+		"""
+		The body of the writer thread: takes all the changes waiting in the queue (up to max_batch) and applies them together.
+		"""
+		while True:
+			batch = [self._queue.get()]
+			while len(batch) < self.max_batch:
+				try:
+					batch.append(self._queue.get_nowait())
+				except queue.Empty:
+					break
+			closing = any(change is self._CLOSE for change in batch)
+			self._apply([change for change in batch if change is not self._CLOSE])
+			for _ in batch:
+				self._queue.task_done()
+			if closing:
+				return
+
+	def _apply(self, batch):
+		"""
+		Coalesces a batch of changes and applies it to the tree and to a new published version.
+		A batch that is large relative to the dictionary rebuilds the version from the tree in O(n),
+		otherwise every change is path-copied in O(log(n)).
+
+		@type batch: list of tuples (key, value, is_delete, future)
+		@rtype: None
+		"""
+		latest = {}
+		try:
+			for change in batch:
+				latest[change[0]] = change
+			inserts = [(key, val) for key, val, is_delete, _ in latest.values() if not is_delete]
+			deletes = [key for key, _, is_delete, _ in latest.values() if is_delete]
+			with self._lock.write_locked():
+				self._tree.delete_many(deletes)
+				self._tree.insert_many(inserts)
+			# only this thread modifies the tree, so it can be read here without the lock:
+			version = self._published
+			if len(latest) >= AVLTree.BATCH_REBUILD_FRACTION * version.size():
+				version = PersistentAVLTree.from_sorted(self._tree.items())
+			else:
+				for key in deletes:
+					version = version.delete(key)
+				for key, val in inserts:
+					version = version.insert(key, val)
+			self._published = version   # publishing is a single (atomic) reference assignment
+		except BaseException as error:
+			self._recover(batch, latest, error)
+			return
+		for change in batch:
+			change[3].set_result(None)
+
+	def _recover(self, batch, latest, error):
+		"""
+		Handles a batch that failed partway (e.g. on keys that cannot be compared):
+		the published version is rebuilt from the tree, so the two agree again,
+		and only the changes the tree does not reflect fail with error.
+		Time Complexity: O(n).
+
+		@type batch: list of tuples (key, value, is_delete, future)
+		@type latest: dict
+		@param latest: the last change of every key of the batch, as far as it was coalesced
+		@type error: BaseException
+		@rtype: None
+		"""
+		self._published = PersistentAVLTree.from_sorted(self._tree.items())
+		for change in batch:
+			try:
+				_, val, is_delete, _ = latest[change[0]]
+				node = self._tree.search(change[0])
+				applied = node is None if is_delete else node is not None and node.value is val
+			except Exception:   # the key cannot be hashed, or compared with the keys of the tree
+				applied = False
+			if applied:
+				change[3].set_result(None)
+			else:
+				change[3].set_exception(error)
+
+#### Read functions #####
+
+	def snapshot(self):
+		"""
+		returns the latest published version, an immutable point-in-time view of the dictionary
+		Time Complexity: O(1).
+
+		@rtype: PersistentAVLTree
+		"""
+		return self._published
+
+	@contextmanager
+	def read(self):
+		"""
+		Holds the read lock, and gives access to the underlying AVLTree for queries the snapshot lacks.
+		The tree must not be modified through this reference.
+
+		@rtype: AVLTree
+		"""
+		with self._lock.read_locked():
+			yield self._tree
+
+	def search(self, key):
+		"""
+		searches for key in the latest published version, without locking
+		Time Complexity: O(log(n)).
+
+		@rtype: PersistentNode
+		@returns: node corresponding to key, None if key does not appear in the dictionary
+		"""
+		return self._published.search(key)
+
+	def rank(self, key):
+		"""
+		returns the rank of key in the latest published version, 0 if key does not appear in it
+
+		@rtype: int
+		"""
+		return self._published.rank(key)
+
+	def select(self, i):
+		"""
+		finds the i'th smallest item in the latest published version
+
+		@type i: int
+		@pre: 1 <= i <= self.size()
+		@rtype: PersistentNode
+		"""
+		return self._published.select(i)
+
+	def size(self):
+		"""
+		returns the number of items in the latest published version
+
+		@rtype: int
+		"""
+		return self._published.size()
+
+	def count_range(self, a, b):
+		"""
+		counts the items with a<=key<=b in the latest published version
+
+		@rtype: int
+		"""
+		return self._published.count_range(a, b)
+
+	def items(self, lo=None, hi=None, reverse=False):
+		"""
+		Iterates over the items of the version published when the iteration starts, see PersistentAVLTree.items().
+		"""
+		return self._published.items(lo, hi, reverse)
+
+	def range_items(self, a, b, limit=None):
+		"""
+		Iterates over the items with a<=key<=b of the version published when the iteration starts.
+		"""
+		return self._published.range_items(a, b, limit)
+
+	def avl_to_array(self):
+		"""
+		Returns a sorted list of the (key, value) items of the latest published version.
+
+		@rtype: list
+		"""
+		return self._published.avl_to_array()
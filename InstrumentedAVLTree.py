@@ -0,0 +1,237 @@
+# Description: This file contains an instrumented AVL tree, collecting statistics of the tree operations.
+# Tomer Nadiv & Ron Ben Harosh 2024
+
+from functools import wraps
+from time import perf_counter_ns
+
+from AVLTree import AVLTree, VIRTUAL_LEAF
+
+"""
+A class implementing a histogram of non-negative integers.
+"""
+class Histogram(object):
+	"""
+	Counts values either exactly (for small values such as path lengths),
+	or in power of two buckets (for wide ranges such as latencies in nanoseconds).
+
+	@type exact: bool
+	@param exact: if True, every value has its own bucket
+	"""
+	__slots__ = ('exact', 'buckets', 'count', 'total', 'minimum', 'maximum')
+
+	def __init__(self, exact=True):
+		self.exact = exact
+		self.buckets = {}
+		self.count = 0
+		self.total = 0
+		self.minimum = None
+		self.maximum = None
+
+	def __repr__(self):
+		return '-Histogram-\n count: %d\n mean: %s' % (self.count, self.total / self.count if self.count else None)
+
+	def add(self, value):
+		bucket = value if self.exact else 1 << max(value - 1, 0).bit_length()   # the smallest power of two >= value
+		self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+		self.count += 1
+		self.total += value
+		if self.minimum is None or value < self.minimum:
+			self.minimum = value
+		if self.maximum is None or value > self.maximum:
+			self.maximum = value
+
+	def to_dict(self):
+		"""
+		returns the histogram as plain data - for bucketed histograms, every key is the upper bound of its bucket
+
+		@rtype: dict
+		"""
+		return {
+			'count': self.count,
+			'sum': self.total,
+			'mean': self.total / self.count if self.count else None,
+			'min': self.minimum,
+			'max': self.maximum,
+			'buckets': {str(bucket): self.buckets[bucket] for bucket in sorted(self.buckets)},
+		}
+
+
+"""
+A class implementing an AVL tree that collects statistics.
+"""
+class InstrumentedAVLTree(AVLTree):
+	"""
+	An AVLTree that records, in addition to its normal work:
+		rotations           - the number of single and double rotations made by balance
+		search_visits       - the number of nodes visited by every search
+		insert_depth        - the number of nodes visited to find where every new node is attached (by a descent or a finger search)
+		height_propagation  - the number of ancestors whose height changed, per insert and delete
+		successor_steps     - the number of pointers followed by every successor call
+		latency_ns          - a latency histogram of every public operation
+	AVLTree itself is not changed, so trees that are not instrumented pay nothing.
+	An existing tree can be instrumented (and back) in place with instrument() and uninstrument().
+	"""
+
+	def __init__(self, *args, **kwargs):
+		AVLTree.__init__(self, *args, **kwargs)
+		self.reset_stats()
+
+	def reset_stats(self):
+		"""
+		Clears all the statistics.
+
+		@rtype: None
+		"""
+		self.single_rotations = 0
+		self.double_rotations = 0
+		self.search_visits = Histogram()
+		self.insert_depth = Histogram()
+		self.height_propagation = Histogram()
+		self.successor_steps = Histogram()
+		self.latency_ns = {}
+		self._rotation_cost = 0   # rebalancing operations done by rotations, so they can be told apart from height changes
+		self._timing = False      # whether an outer operation is being timed
+
+	def stats(self):
+		"""
+		returns the statistics as plain data (e.g. for JSON), for shipping to a metrics pipeline
+
+		@rtype: dict
+		"""
+		return {
+			'rotations': {'single': self.single_rotations, 'double': self.double_rotations},
+			'search_visits': self.search_visits.to_dict(),
+			'insert_depth': self.insert_depth.to_dict(),
+			'height_propagation': self.height_propagation.to_dict(),
+			'successor_steps': self.successor_steps.to_dict(),
+			'latency_ns': {op: histogram.to_dict() for op, histogram in sorted(self.latency_ns.items())},
+		}
+
+	def balance(self, node):
+		rotations = AVLTree.balance(self, node)
+		if rotations == 1:
+			self.single_rotations += 1
+		elif rotations == 2:
+			self.double_rotations += 1
+		self._rotation_cost += rotations
+		return rotations
+
+	def search(self, key):
+		# the descent of AVLTree.search, counting the visited nodes:
+		visits = 0
+		node = self.virtual_root.right
+		while node is not VIRTUAL_LEAF:
+			visits += 1
+			if key == node.key:
+				break
+			node = node.left if key < node.key else node.right
+		self.search_visits.add(visits)
+		if node is VIRTUAL_LEAF or not node.live:
+			return None
+		return node
+
+	def insert(self, key, val):
+		# the descent of AVLTree.insert, counting the visited nodes:
+		visits = 0
+		parent = self.virtual_root
+		node = parent.right
+		while node is not VIRTUAL_LEAF:
+			visits += 1
+			if key == node.key:
+				self._set_value(node, val)
+				return 0
+			parent = node
+			node = node.left if key < node.key else node.right
+		return self._attach(parent, key, val, visits)[1]
+
+	def _attach(self, parent, key, val, nodes_visited=0):
+		self.insert_depth.add(nodes_visited)
+		rotation_cost = self._rotation_cost
+		new_node, rebalances = AVLTree._attach(self, parent, key, val, nodes_visited)
+		# every rebalancing operation that is not a rotation is a height change:
+		self.height_propagation.add(rebalances - (self._rotation_cost - rotation_cost))
+		return new_node, rebalances
+
+	def delete(self, node):
+		if node.left is not VIRTUAL_LEAF and node.right is not VIRTUAL_LEAF:
+			return AVLTree.delete(self, node)   # recurses into the deletion of the successor, which is recorded
+		rotation_cost = self._rotation_cost
+		rebalances = AVLTree.delete(self, node)
+		self.height_propagation.add(rebalances - (self._rotation_cost - rotation_cost))
+		return rebalances
+
+	def successor(self, node):
+		# the walk of AVLTree.successor, counting the followed pointers:
+		if node is self.max_node:
+			return None
+		steps = 1
+		if node.right is not VIRTUAL_LEAF:     # the minimum of the right subtree
+			node = node.right
+			while node.left is not VIRTUAL_LEAF:
+				node = node.left
+				steps += 1
+		else:                                  # the first ancestor node is a left descendant of
+			while node.parent.right is node:
+				node = node.parent
+				steps += 1
+			node = node.parent
+		self.successor_steps.add(steps)
+		return node
+
+
+TIMED_OPERATIONS = ('search', 'insert', 'insert_from_max', 'insert_from_min', 'insert_near', 'search_near',
+					'delete', 'delete_key', 'insert_many', 'delete_many', 'rank', 'select', 'max_range',
+					'aggregate', 'successor', 'predecessor', 'split', 'avl_to_array')
+
+def _timed(name, method):
+	"""
+	Wraps a method of InstrumentedAVLTree with a latency measurement.
+	Only the outermost operation is timed - operations called from within it (e.g. the search of delete_key) are not.
+	"""
+	@wraps(method)
+	def timed(self, *args, **kwargs):
+		if self._timing:
+			return method(self, *args, **kwargs)
+		self._timing = True
+		start = perf_counter_ns()
+		try:
+			return method(self, *args, **kwargs)
+		finally:
+			elapsed = perf_counter_ns() - start
+			self._timing = False
+			histogram = self.latency_ns.get(name)
+			if histogram is None:
+				histogram = self.latency_ns[name] = Histogram(exact=False)
+			histogram.add(elapsed)
+	return timed
+
+for _name in TIMED_OPERATIONS:
+	setattr(InstrumentedAVLTree, _name, _timed(_name, getattr(InstrumentedAVLTree, _name)))
+del _name
+
+
+def instrument(tree):
+	"""
+	Turns an existing AVLTree into an InstrumentedAVLTree in place, with empty statistics.
+
+	@type tree: AVLTree
+	@rtype: InstrumentedAVLTree
+	@returns: tree
+	"""
+	tree.__class__ = InstrumentedAVLTree
+	tree.reset_stats()
+	return tree
+
+def uninstrument(tree):
+	"""
+	Turns an InstrumentedAVLTree back into a plain AVLTree in place, dropping its statistics.
+
+	@type tree: InstrumentedAVLTree
+	@rtype: AVLTree
+	@returns: tree
+	"""
+	tree.__class__ = AVLTree
+	for name in ('single_rotations', 'double_rotations', 'search_visits', 'insert_depth', 'height_propagation',
+				 'successor_steps', 'latency_ns', '_rotation_cost', '_timing'):
+		del tree.__dict__[name]
+	return tree
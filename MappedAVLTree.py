@@ -0,0 +1,328 @@
+# Description: This file contains the binary file format of an AVL tree, and a read-only tree mapped from such a file.
+# Tomer Nadiv & Ron Ben Harosh 2024
+
+import mmap
+import pickle
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from numbers import Integral
+
+"""
+File format (little-endian):
+	header - magic b'AVLT', format version (uint16), key column code, value column code, 8 padding bytes,
+			 number of items n (uint64), size of the value blob in bytes (uint64)
+	keys   - n sorted keys, 'q' (int64) or 'd' (double)
+	values - for value code 'q' or 'd': n values of that type;
+			 for 's' (utf-8 strings) or 'o' (pickled objects): the blob of the encoded values,
+			 followed by n+1 offsets (uint64) of the values in the blob
+The items are stored sorted by key, which already determines the perfectly balanced tree (every root is a middle item),
+so no tree layout is stored - loading rebuilds it in O(n), and the mapped tree binary-searches the key column.
+"""
+MAGIC = b'AVLT'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHcc8xQQ')
+CHUNK = 1 << 16      # number of items written at a time
+INT64_MIN, INT64_MAX = -(1 << 63), (1 << 63) - 1
+DOUBLE_EXACT = 1 << 53   # every integer up to this magnitude is exactly a double
+
+
+def column_code(values, for_keys=False):
+	"""
+	Chooses the column code that can store every value.
+	Integers of any integral type (e.g. numpy integers) are stored as int64.
+	Integer and float keys are stored together as doubles only if every integer converts exactly,
+	while a value column of mixed types is pickled, so integer values are not loaded back as floats.
+
+	@type values: iterable
+	@rtype: str
+	@returns: 'q' for int64, 'd' for floats, 's' for strings, 'o' for any other (pickled) objects
+	"""
+	code = None
+	exact = True   # whether every integer converts to a double without losing precision
+	for value in values:
+		if isinstance(value, Integral) and not isinstance(value, bool) and INT64_MIN <= value <= INT64_MAX:
+			kind = 'q'
+			if not -DOUBLE_EXACT <= value <= DOUBLE_EXACT:
+				exact = False
+		elif isinstance(value, float):
+			kind = 'd'
+		elif type(value) is str and not for_keys:
+			kind = 's'
+		elif for_keys:
+			raise TypeError('keys must be int64 or float to be dumped, got %r' % (value,))
+		else:
+			return 'o'
+		if code is None:
+			code = kind
+		elif code != kind:
+			if not for_keys:
+				return 'o'
+			code = 'qd'                  # integer and float keys, checked once all keys are seen
+	if code == 'qd':
+		if not exact:
+			raise TypeError('integer keys beyond 2**53 cannot be dumped together with float keys without losing precision')
+		return 'd'
+	return code or 'q'
+
+def write_columns(path, size, keys, values):
+	"""
+	Writes sorted items to path in the file format above, streaming the keys and the values.
+	Time Complexity: O(n), O(1) extra memory for numeric values, O(n) words for the offsets of encoded values.
+
+	@type size: int
+	@param size: the number of items
+	@type keys: function () -> iterable
+	@type values: function () -> iterable
+	@param keys, values: functions returning (fresh) iterators over the sorted keys and the values
+	@rtype: None
+	"""
+	key_code = column_code(keys(), for_keys=True)
+	value_code = column_code(values())
+	with open(path, 'wb') as file:
+		file.write(HEADER.pack(MAGIC, FORMAT_VERSION, key_code.encode(), value_code.encode(), size, 0))
+		_write_column(file, key_code, keys())
+		if value_code in 'qd':
+			_write_column(file, value_code, values())
+			return
+
+		# encoded values - the blob, then the offsets:
+		encode = str.encode if value_code == 's' else pickle.dumps
+		offsets = array('Q', [0])
+		blob_size = 0
+		for value in values():
+			data = encode(value)
+			file.write(data)
+			blob_size += len(data)
+			offsets.append(blob_size)
+		if sys.byteorder != 'little':
+			offsets.byteswap()
+		offsets.tofile(file)
+		file.seek(0)
+		file.write(HEADER.pack(MAGIC, FORMAT_VERSION, key_code.encode(), value_code.encode(), size, blob_size))
+
+def _write_column(file, code, values):
+	"""
+	Writes a numeric column in chunks.
+
+	@rtype: None
+	"""
+	chunk = array(code)
+	for value in values:
+		chunk.append(value)
+		if len(chunk) == CHUNK:
+			_flush_column(file, chunk)
+			chunk = array(code)
+	_flush_column(file, chunk)
+
+def _flush_column(file, chunk):
+	if sys.byteorder != 'little':
+		chunk.byteswap()
+	chunk.tofile(file)
+
+def read_header(data):
+	"""
+	Parses and checks the header of a file.
+
+	@type data: bytes-like
+	@rtype: tuple
+	@returns: (key code, value code, n, blob size)
+	"""
+	magic, version, key_code, value_code, size, blob_size = HEADER.unpack_from(data, 0)
+	if magic != MAGIC:
+		raise ValueError('not an AVL tree file')
+	if version != FORMAT_VERSION:
+		raise ValueError('unsupported AVL tree file version %d' % version)
+	return key_code.decode(), value_code.decode(), size, blob_size
+
+def read_columns(path):
+	"""
+	Reads the items of a file.
+	Time Complexity: O(n).
+
+	@rtype: tuple of lists
+	@returns: (keys, values), sorted by key
+	"""
+	with open(path, 'rb') as file:
+		data = file.read()
+	key_code, value_code, size, blob_size = read_header(data)
+	position = HEADER.size
+	keys = _read_column(data, key_code, position, size)
+	position += 8 * size
+	if value_code in 'qd':
+		return keys, _read_column(data, value_code, position, size)
+	blob = memoryview(data)[position:position + blob_size]
+	offsets = _read_column(data, 'Q', position + blob_size, size + 1)
+	decode = _decoder(value_code)
+	return keys, [decode(blob[offsets[i]:offsets[i + 1]]) for i in range(size)]
+
+def _read_column(data, code, position, count):
+	column = array(code)
+	column.frombytes(data[position:position + 8 * count])
+	if sys.byteorder != 'little':
+		column.byteswap()
+	return column.tolist()
+
+def _decoder(value_code):
+	if value_code == 's':
+		return lambda data: str(data, 'utf-8')
+	return pickle.loads
+
+
+"""
+A class implementing a read-only AVL tree mapped from a file.
+"""
+class MappedAVLTree(object):
+	"""
+	A read-only dictionary answering queries directly from a file written by AVLTree.dump, without loading it.
+	The file is memory-mapped, and the key column is binary-searched in place,
+	so opening costs O(1) and only the pages that a query touches are read.
+	The sorted key column is the in-order walk of the perfectly balanced tree, and a binary search visits
+	exactly the nodes that a search in that tree would.
+
+	@type path: str
+	@param path: a file written by AVLTree.dump
+	"""
+
+	def __init__(self, path):
+		if sys.byteorder != 'little':
+			raise NotImplementedError('MappedAVLTree reads little-endian columns in place, use AVLTree.load instead')
+		with open(path, 'rb') as file:
+			self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+		key_code, value_code, size, blob_size = read_header(self._mmap)
+		view = memoryview(self._mmap)
+		position = HEADER.size
+		self._keys = view[position:position + 8 * size].cast(key_code)
+		position += 8 * size
+		self._value_code = value_code
+		if value_code in 'qd':
+			self._values = view[position:position + 8 * size].cast(value_code)
+		else:
+			self._blob = view[position:position + blob_size]
+			self._offsets = view[position + blob_size:position + blob_size + 8 * (size + 1)].cast('Q')
+			self._decode = _decoder(value_code)
+		self._size = size
+
+	def __repr__(self):
+		return '-Mapped AVL Tree-\n size: %d' % self._size
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc, tb):
+		self.close()
+
+	def close(self):
+		"""
+		Unmaps the file, the tree cannot be used afterwards.
+		"""
+		for name in ('_keys', '_values', '_blob', '_offsets'):
+			if hasattr(self, name):
+				getattr(self, name).release()
+		self._mmap.close()
+
+	def _value(self, i):
+		"""
+		returns the value of the i'th item (0-based)
+		"""
+		if self._value_code in 'qd':
+			return self._values[i]
+		return self._decode(self._blob[self._offsets[i]:self._offsets[i + 1]])
+
+	def size(self):
+		"""
+		returns the number of items in the dictionary
+
+		@rtype: int
+		"""
+		return self._size
+
+	def __len__(self):
+		return self._size
+
+	def search(self, key):
+		"""
+		searches for key
+		Time Complexity: O(log(n)).
+
+		@rtype: tuple
+		@returns: the (key, value) item of key, None if key does not appear in the dictionary
+		"""
+		i = bisect_left(self._keys, key)
+		if i < self._size and self._keys[i] == key:
+			return self._keys[i], self._value(i)
+		return None
+
+	def rank(self, key):
+		"""
+		computes the rank of key
+		Time Complexity: O(log(n)).
+
+		@rtype: int
+		@returns: the rank of key, 0 if key does not appear in the dictionary
+		"""
+		i = bisect_left(self._keys, key)
+		if i < self._size and self._keys[i] == key:
+			return i + 1
+		return 0
+
+	def select(self, i):
+		"""
+		finds the i'th smallest item
+		Time Complexity: O(1).
+
+		@type i: int
+		@pre: 1 <= i <= self.size()
+		@rtype: tuple
+		@returns: the (key, value) item of rank i
+		"""
+		return self._keys[i - 1], self._value(i - 1)
+
+	def count_range(self, a, b):
+		"""
+		counts the items with a<=key<=b
+		Time Complexity: O(log(n)).
+
+		@rtype: int
+		"""
+		if a > b:
+			return 0
+		return bisect_right(self._keys, b) - bisect_left(self._keys, a)
+
+	def items(self, lo=None, hi=None, reverse=False):
+		"""
+		Iterates over the (key, value) items with lo <= key <= hi, in key order.
+		Time Complexity: O(log(n) + k) for k items.
+		"""
+		for i in self._positions(lo, hi, reverse):
+			yield self._keys[i], self._value(i)
+
+	def keys(self, lo=None, hi=None, reverse=False):
+		"""
+		Iterates over the keys with lo <= key <= hi, as items().
+		"""
+		for i in self._positions(lo, hi, reverse):
+			yield self._keys[i]
+
+	def _positions(self, lo, hi, reverse):
+		"""
+		returns the range of the (0-based) positions of the keys with lo <= key <= hi
+
+		@rtype: range
+		"""
+		start = 0 if lo is None else bisect_left(self._keys, lo)
+		end = self._size if hi is None else bisect_right(self._keys, hi)
+		return range(end - 1, start - 1, -1) if reverse else range(start, end)
+
+	def __iter__(self):
+		return self.keys()
+
+	def avl_to_array(self):
+		"""
+		Returns a sorted list of the (key, value) items.
+		Time Complexity: O(n).
+
+		@rtype: list
+		"""
+		return list(self.items())
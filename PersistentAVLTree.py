@@ -0,0 +1,431 @@
+# Description: This file contains a persistent (copy-on-write) implementation of the AVL tree data structure.
+# Tomer Nadiv & Ron Ben Harosh 2024
+
+from itertools import islice
+
+from AVLTree import VIRTUAL_LEAF
+
+"""
+A class representing an immutable node of a persistent AVL tree.
+"""
+class PersistentNode(object):
+	"""
+	A node is never modified once it is linked into a version, so it may be shared by many versions.
+	It has no parent pointer, as it may have a different parent in every version.
+
+	@type key: int
+	@param key: key of your node
+	@type value: string
+	@param value: data of your node
+	@type left: PersistentNode or VirtualLeaf
+	@type right: PersistentNode or VirtualLeaf
+	@param left, right: the sons of the node
+	"""
+	__slots__ = ('key', 'value', 'left', 'right', 'height', 'size')
+
+	def __init__(self, key, value, left, right):
+		self.key = key
+		self.value = value
+		self.left = left
+		self.right = right
+		self.height = (left.height if left.height > right.height else right.height) + 1
+		self.size = left.size + right.size + 1
+
+	def __repr__(self):
+		return '-PERSISTENT AVL NODE-\n key: %r\n value: %r' % (self.key, self.value)
+
+	def is_real_node(self):
+		"""returns whether self is not a virtual node
+
+		@rtype: bool
+		@returns: True.
+		"""
+		return True
+
+
+def balance(node):
+	"""
+	Returns a balanced copy of node, whose sons are balanced and differ in height by at most 2.
+	Rotations create new nodes, the sons of node are shared.
+	Time Complexity: O(1).
+
+	@type node: PersistentNode
+	@rtype: PersistentNode
+	"""
+	bf = node.left.height - node.right.height
+	if bf > 1:
+		left = node.left
+		if left.left.height < left.right.height:   # left-right case
+			pivot = left.right
+			return PersistentNode(pivot.key, pivot.value,
+								  PersistentNode(left.key, left.value, left.left, pivot.left),
+								  PersistentNode(node.key, node.value, pivot.right, node.right))
+		return PersistentNode(left.key, left.value, left.left,
+							  PersistentNode(node.key, node.value, left.right, node.right))
+	if bf < -1:
+		right = node.right
+		if right.right.height < right.left.height:  # right-left case
+			pivot = right.left
+			return PersistentNode(pivot.key, pivot.value,
+								  PersistentNode(node.key, node.value, node.left, pivot.left),
+								  PersistentNode(right.key, right.value, pivot.right, right.right))
+		return PersistentNode(right.key, right.value,
+							  PersistentNode(node.key, node.value, node.left, right.left), right.right)
+	return node
+
+def rebuild_path(path, subtree):
+	"""
+	Copies the nodes of a search path bottom-up over a new subtree, rebalancing each copy.
+	Time Complexity: O(log(n)).
+
+	@type path: list of tuples (PersistentNode, bool)
+	@param path: the nodes from the root down, each with whether the search turned left at it
+	@type subtree: PersistentNode or VirtualLeaf
+	@param subtree: the new subtree that replaces the son at the bottom of the path
+	@rtype: PersistentNode or VirtualLeaf
+	@returns: the new root
+	"""
+	for node, went_left in reversed(path):
+		if went_left:
+			subtree = balance(PersistentNode(node.key, node.value, subtree, node.right))
+		else:
+			subtree = balance(PersistentNode(node.key, node.value, node.left, subtree))
+	return subtree
+
+
+"""
+A class implementing a persistent AVL tree.
+"""
+class PersistentAVLTree(object):
+	"""
+	A version of a persistent dictionary.
+	insert and delete do not change self - they copy the O(log(n)) nodes on the search path
+	and return a new version, which shares all other nodes with self.
+	So every version stays valid and can be read (e.g. by another thread) while newer versions are created.
+
+	@type root: PersistentNode or None
+	@param root: the root of the version, None for an empty dictionary
+	"""
+	__slots__ = ('root',)
+
+	def __init__(self, root=None):
+		self.root = VIRTUAL_LEAF if root is None else root
+
+	def __repr__(self):
+		return '-Persistent AVL Tree-\n size: %d' % self.size()
+
+	@classmethod
+	def from_sorted(cls, pairs):
+		"""
+		Builds a perfectly balanced version from items sorted by key.
+		Time Complexity: O(n).
+
+		@type pairs: iterable of tuples (key, value)
+		@pre: keys are strictly increasing
+		@rtype: PersistentAVLTree
+		"""
+		items = list(pairs)
+
+		def build_rec(lo, hi):
+			"""
+			Recursive build of items[lo:hi], the middle item is the root.
+
+			@rtype: PersistentNode or VirtualLeaf
+			"""
+			if lo >= hi:
+				return VIRTUAL_LEAF
+			mid = (lo + hi) // 2
+			key, value = items[mid]
+			return PersistentNode(key, value, build_rec(lo, mid), build_rec(mid + 1, hi))
+
+		return cls(build_rec(0, len(items)))
+
+	def get_root(self):
+		"""
+		returns the root of the version
+
+		@rtype: PersistentNode
+		@returns: the root, None if the dictionary is empty
+		"""
+		if self.root is VIRTUAL_LEAF:
+			return None
+		return self.root
+
+	def size(self):
+		"""
+		returns the number of items in the version
+
+		@rtype: int
+		"""
+		return self.root.size
+
+	def __len__(self):
+		return self.root.size
+
+	def search(self, key):
+		"""
+		searches for a node in the version corresponding to the key
+		Time Complexity: O(log(n)).
+
+		@type key: int
+		@rtype: PersistentNode
+		@returns: node corresponding to key, None if key does not appear in the version
+		"""
+		node = self.root
+		while node is not VIRTUAL_LEAF:
+			if key == node.key:
+				return node
+			node = node.left if key < node.key else node.right
+		return None
+
+	def insert(self, key, val):
+		"""
+		returns a new version with the item inserted (or its value replaced, if key already appears)
+		Time Complexity: O(log(n)) time and new nodes.
+
+		@type key: int
+		@type val: string
+		@rtype: PersistentAVLTree
+		@returns: the new version, self is unchanged
+		"""
+		path = []
+		node = self.root
+		while node is not VIRTUAL_LEAF:
+			if key == node.key:   # same shape, only the value changes - no rebalancing on the path
+				subtree = PersistentNode(key, val, node.left, node.right)
+				for parent, went_left in reversed(path):
+					if went_left:
+						subtree = PersistentNode(parent.key, parent.value, subtree, parent.right)
+					else:
+						subtree = PersistentNode(parent.key, parent.value, parent.left, subtree)
+				return PersistentAVLTree(subtree)
+			went_left = key < node.key
+			path.append((node, went_left))
+			node = node.left if went_left else node.right
+		return PersistentAVLTree(rebuild_path(path, PersistentNode(key, val, VIRTUAL_LEAF, VIRTUAL_LEAF)))
+
+	def delete(self, key):
+		"""
+		returns a new version without the item of key
+		A node with two sons is replaced by a copy of its successor, whose removal is path-copied as well.
+		Time Complexity: O(log(n)) time and new nodes.
+
+		@type key: int
+		@rtype: PersistentAVLTree
+		@returns: the new version, self if key does not appear in it
+		"""
+		path = []
+		node = self.root
+		while node is not VIRTUAL_LEAF and key != node.key:
+			went_left = key < node.key
+			path.append((node, went_left))
+			node = node.left if went_left else node.right
+		if node is VIRTUAL_LEAF:
+			return self
+
+		if node.left is VIRTUAL_LEAF:
+			subtree = node.right
+		elif node.right is VIRTUAL_LEAF:
+			subtree = node.left
+		else:
+			# remove the successor - the minimum of the right subtree:
+			successor_path = []
+			successor = node.right
+			while successor.left is not VIRTUAL_LEAF:
+				successor_path.append((successor, True))
+				successor = successor.left
+			right = rebuild_path(successor_path, successor.right)
+			subtree = balance(PersistentNode(successor.key, successor.value, node.left, right))
+		return PersistentAVLTree(rebuild_path(path, subtree))
+
+	def rank(self, key):
+		"""
+		compute the rank of key in the version
+		Time Complexity: O(log(n)).
+
+		@type key: int
+		@rtype: int
+		@returns: the rank of key, 0 if key does not appear in the version
+		"""
+		cnt = 0
+		node = self.root
+		while node is not VIRTUAL_LEAF:
+			if key == node.key:
+				return cnt + node.left.size + 1
+			if key < node.key:
+				node = node.left
+			else:
+				cnt += node.left.size + 1
+				node = node.right
+		return 0
+
+	def select(self, i):
+		"""
+		finds the i'th smallest item (according to keys) in the version
+		Time Complexity: O(log(n)).
+
+		@type i: int
+		@pre: 1 <= i <= self.size()
+		@rtype: PersistentNode
+		"""
+		node = self.root
+		while node.left.size + 1 != i:
+			if i <= node.left.size:
+				node = node.left
+			else:
+				i -= node.left.size + 1
+				node = node.right
+		return node
+
+	def minimum(self):
+		"""
+		returns the node with the minimal key, None if the version is empty
+		Time Complexity: O(log(n)).
+
+		@rtype: PersistentNode
+		"""
+		node = self.root
+		if node is VIRTUAL_LEAF:
+			return None
+		while node.left is not VIRTUAL_LEAF:
+			node = node.left
+		return node
+
+	def maximum(self):
+		"""
+		returns the node with the maximal key, None if the version is empty
+		Time Complexity: O(log(n)).
+
+		@rtype: PersistentNode
+		"""
+		node = self.root
+		if node is VIRTUAL_LEAF:
+			return None
+		while node.right is not VIRTUAL_LEAF:
+			node = node.right
+		return node
+
+	def count_range(self, a, b):
+		"""
+		counts the items with a<=key<=b
+		Time Complexity: O(log(n)).
+
+		@rtype: int
+		"""
+		if a > b:
+			return 0
+		return self._count_smaller(b, True) - self._count_smaller(a, False)
+
+	def _count_smaller(self, key, inclusive):
+		"""
+		Counts the items with a key smaller than key (or equal to it, if inclusive).
+		Time Complexity: O(log(n)).
+
+		@rtype: int
+		"""
+		count = 0
+		node = self.root
+		while node is not VIRTUAL_LEAF:
+			if node.key < key or (inclusive and node.key == key):
+				count += node.left.size + 1
+				node = node.right
+			else:
+				node = node.left
+		return count
+
+	def avl_to_array(self):
+		"""
+		Returns an array representing the version.
+		Time Complexity: O(n).
+
+		@rtype: list
+		@returns: a sorted list according to key of tuples (key, value)
+		"""
+		return list(self.items())
+
+	def items(self, lo=None, hi=None, reverse=False):
+		"""
+		Iterates over the (key, value) items of the version with lo <= key <= hi, in key order.
+		Without parent pointers, the walk keeps the pending ancestors on an explicit stack.
+		Time Complexity: O(log(n) + k) for k items.
+
+		@type lo: int or None
+		@param lo: the smallest key to yield, None for no lower bound.
+		@type hi: int or None
+		@param hi: the largest key to yield, None for no upper bound.
+		@type reverse: bool
+		@param reverse: if True, the items are yielded in descending order.
+		"""
+		for node in self._walk(lo, hi, reverse):
+			yield node.key, node.value
+
+	def keys(self, lo=None, hi=None, reverse=False):
+		"""
+		Iterates over the keys of the version with lo <= key <= hi, as items().
+		"""
+		for node in self._walk(lo, hi, reverse):
+			yield node.key
+
+	def values(self, lo=None, hi=None, reverse=False):
+		"""
+		Iterates over the values of the items with lo <= key <= hi, as items().
+		"""
+		for node in self._walk(lo, hi, reverse):
+			yield node.value
+
+	def range_items(self, a, b, limit=None):
+		"""
+		Iterates over the (key, value) items with a<=key<=b, at most limit of them.
+		Time Complexity: O(log(n) + k) for k reported items.
+		"""
+		items = self.items(a, b)
+		if limit is not None:
+			items = islice(items, limit)
+		return items
+
+	def __iter__(self):
+		return self.keys()
+
+	def __reversed__(self):
+		return self.keys(reverse=True)
+
+	def _walk(self, lo, hi, reverse):
+		"""
+		Iterative in-order walk over the nodes with lo <= key <= hi.
+
+		@rtype: generator of PersistentNode
+		"""
+		stack = []
+		node = self.root
+		if not reverse:
+			while node is not VIRTUAL_LEAF:
+				if lo is not None and node.key < lo:
+					node = node.right
+				else:
+					stack.append(node)
+					node = node.left
+			while stack:
+				node = stack.pop()
+				if hi is not None and node.key > hi:
+					return
+				yield node
+				node = node.right
+				while node is not VIRTUAL_LEAF:
+					stack.append(node)
+					node = node.left
+		else:
+			while node is not VIRTUAL_LEAF:
+				if hi is not None and node.key > hi:
+					node = node.left
+				else:
+					stack.append(node)
+					node = node.right
+			while stack:
+				node = stack.pop()
+				if lo is not None and node.key < lo:
+					return
+				yield node
+				node = node.left
+				while node is not VIRTUAL_LEAF:
+					stack.append(node)
+					node = node.right
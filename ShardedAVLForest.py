@@ -0,0 +1,493 @@
+# Description: This file contains a key-range sharded forest of AVL trees, with shards owned by worker processes.
+# Tomer Nadiv & Ron Ben Harosh 2024
+
+from bisect import bisect_left, bisect_right
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import accumulate
+
+from AVLTree import AVLTree, AVLNode
+
+"""
+Shard operations, executed in the worker process that owns the shard.
+Every function gets the id of its shard and returns plain data (never nodes, which would drag their whole tree along).
+shards is the dictionary of trees of the worker - the process-wide _SHARDS in a worker process,
+or the dictionary of a _LocalWorker.
+"""
+_SHARDS = {}
+
+def _shard_load(shard_id, items, shards=None):
+	shards = _SHARDS if shards is None else shards
+	shards[shard_id] = AVLTree.from_sorted(items)
+	return shards[shard_id].size()
+
+def _shard_search(shard_id, key, shards=None):
+	node = (_SHARDS if shards is None else shards)[shard_id].search(key)
+	return None if node is None else (node.key, node.value)
+
+def _shard_insert(shard_id, key, val, shards=None):
+	tree = (_SHARDS if shards is None else shards)[shard_id]
+	return tree.insert(key, val), tree.size()
+
+def _shard_delete(shard_id, key, shards=None):
+	tree = (_SHARDS if shards is None else shards)[shard_id]
+	return tree.delete_key(key), tree.size()
+
+def _shard_insert_many(shard_id, items, shards=None):
+	tree = (_SHARDS if shards is None else shards)[shard_id]
+	tree.insert_many(items)
+	return tree.size()
+
+def _shard_delete_many(shard_id, keys, shards=None):
+	tree = (_SHARDS if shards is None else shards)[shard_id]
+	tree.delete_many(keys)
+	return tree.size()
+
+def _shard_rank(shard_id, key, shards=None):
+	tree = (_SHARDS if shards is None else shards)[shard_id]
+	node = tree.search(key)
+	return 0 if node is None else tree.rank(node)
+
+def _shard_select(shard_id, i, shards=None):
+	node = (_SHARDS if shards is None else shards)[shard_id].select(i)
+	return node.key, node.value
+
+def _shard_count_range(shard_id, a, b, shards=None):
+	return (_SHARDS if shards is None else shards)[shard_id].count_range(a, b)
+
+def _shard_export(shard_id, shards=None):
+	return (_SHARDS if shards is None else shards)[shard_id].avl_to_array()
+
+def _shard_drop(shard_id, shards=None):
+	"""Removes the shard from the worker, and returns its items."""
+	return (_SHARDS if shards is None else shards).pop(shard_id).avl_to_array()
+
+def _shard_split(shard_id, new_id, shards=None):
+	"""
+	Splits the shard at its median key with AVLTree.split, the upper half becomes shard new_id in the same worker.
+	Time Complexity: O(log(n)).
+
+	@rtype: tuple
+	@returns: (median key, size of the lower half, size of the upper half)
+	"""
+	shards = _SHARDS if shards is None else shards
+	tree = shards[shard_id]
+	key = tree.select(tree.size() // 2 + 1).key
+	left, right = tree.split(key)
+	shards[shard_id] = left
+	shards[new_id] = right
+	return key, left.size(), right.size()
+
+def _shard_merge(shard_id, other_id, shards=None):
+	"""
+	Joins shard other_id (holding greater keys) into shard_id, both in this worker.
+
+	@rtype: int
+	@returns: the size of the merged shard
+	"""
+	shards = _SHARDS if shards is None else shards
+	shards[shard_id] = _join_trees(shards[shard_id], shards.pop(other_id))
+	return shards[shard_id].size()
+
+def _shard_absorb(shard_id, items, shards=None):
+	"""
+	Joins the items of a shard from another worker (greater keys, sorted) into shard_id.
+
+	@rtype: int
+	@returns: the size of the merged shard
+	"""
+	shards = _SHARDS if shards is None else shards
+	shards[shard_id] = _join_trees(shards[shard_id], AVLTree.from_sorted(items))
+	return shards[shard_id].size()
+
+def _join_trees(left, right):
+	"""
+	Concatenates two trees with AVLTree.join, the minimum of right is taken out as the pivot.
+	Time Complexity: O(log(n)).
+
+	@pre: every key of left < every key of right
+	@rtype: AVLTree
+	"""
+	if right.size() == 0:
+		return left
+	if left.size() == 0:
+		return right
+	node = right.select(1)
+	pivot = AVLNode(node.key, node.value)
+	right.delete(node)
+	return AVLTree.join(left, pivot, right)
+
+
+"""
+A class implementing an in-process stand-in for a worker.
+"""
+class _LocalWorker(object):
+	"""
+	Runs the shard operations synchronously in the calling process, with the submit() interface of an executor.
+	"""
+
+	def __init__(self):
+		self.shards = {}
+
+	def submit(self, fn, *args):
+		future = Future()
+		try:
+			future.set_result(fn(*args, shards=self.shards))
+		except BaseException as error:
+			future.set_exception(error)
+		return future
+
+	def shutdown(self, wait=True):
+		self.shards.clear()
+
+
+"""
+A class implementing a key-range sharded forest of AVL trees.
+"""
+class ShardedAVLForest(object):
+	"""
+	A dictionary partitioned by key ranges into AVLTree shards.
+	Shard i holds the keys in [bounds[i-1], bounds[i]). Every shard lives in one of the worker processes
+	(each a single-process ProcessPoolExecutor, so it keeps its shards between calls), and shards are
+	spread over the workers round-robin, so bulk operations on different shards run on different cores.
+	Point operations are routed to their shard by binary search on the boundaries.
+	A shard that grows beyond max_shard_size is split at its median key (AVLTree.split, in its worker),
+	and a shard that shrinks below min_shard_size (a quarter of it) is joined to a neighbour (AVLTree.join).
+	The sizes of the shards are cached, so global rank and select use their prefix sums.
+
+	@type workers: int
+	@param workers: the number of worker processes, 0 to keep the shards in the calling process
+	@type max_shard_size: int
+	@param max_shard_size: the size beyond which a shard is split
+	"""
+
+	def __init__(self, workers=4, max_shard_size=1 << 20):
+		self.max_shard_size = max_shard_size
+		self.min_shard_size = max_shard_size // 4   # the size below which a shard is joined to a neighbour
+		if workers:
+			self._workers = [ProcessPoolExecutor(max_workers=1) for _ in range(workers)]
+		else:
+			self._workers = [_LocalWorker()]
+		self._next_worker = 0
+		self._next_id = 0
+		self._bounds = []       # the smallest key of every shard but the first
+		self._ids = []          # shard ids, in key order
+		self._sizes = []        # cached shard sizes, aligned with _ids
+		self._worker_of = {}    # shard id -> worker
+		self._prefix = None     # cached prefix sums of _sizes, None when stale
+		self._add_shard(0)
+		self._call(0, _shard_load, [])
+
+	def __repr__(self):
+		return '-Sharded AVL Forest-\n size: %d\n shards: %d' % (self.size(), len(self._ids))
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc, tb):
+		self.close()
+
+	def close(self):
+		"""
+		Shuts the worker processes down, the forest cannot be used afterwards.
+		"""
+		for worker in self._workers:
+			worker.shutdown()
+
+	@classmethod
+	def from_sorted(cls, pairs, shards=None, workers=4, max_shard_size=1 << 20):
+		"""
+		Builds a forest from items sorted by key: the items are cut into equal ranges,
+		and every worker builds its shards in parallel (AVLTree.from_sorted).
+		No shard is built smaller than min_shard_size, so the first bulk operation does not join them back.
+		Time Complexity: O(n), divided between the workers.
+
+		@type pairs: iterable of tuples (key, value)
+		@pre: keys are strictly increasing
+		@type shards: int or None
+		@param shards: the number of shards, by default enough for max_shard_size and one per worker if the items suffice
+		@rtype: ShardedAVLForest
+		"""
+		items = list(pairs)
+		forest = cls(workers, max_shard_size)
+		if shards is None:
+			shards = max(len(forest._workers), -(-len(items) // max_shard_size))
+		shards = max(1, min(shards, len(items) // max(forest.min_shard_size, 1)))
+		forest._load([items[len(items) * i // shards: len(items) * (i + 1) // shards] for i in range(shards)])
+		return forest
+
+	def _load(self, chunks):
+		"""
+		Replaces the content of the forest with one new shard per (non-empty, sorted) chunk, loaded in parallel.
+
+		@rtype: None
+		"""
+		for shard_id in self._ids:
+			self._worker_of[shard_id].submit(_shard_drop, shard_id).result()
+		self._bounds, self._ids, self._sizes, self._worker_of = [], [], [], {}
+		futures = []
+		for i, chunk in enumerate(chunks):
+			self._add_shard(i)
+			if i > 0:
+				self._bounds.append(chunk[0][0])
+			futures.append(self._worker_of[self._ids[i]].submit(_shard_load, self._ids[i], chunk))
+		self._sizes = [future.result() for future in futures]
+		self._prefix = None
+
+	def _add_shard(self, index, worker=None):
+		"""
+		Allocates a new shard id at position index, on the given worker or on the next one (round-robin).
+
+		@rtype: int
+		@returns: the new shard id
+		"""
+		if worker is None:
+			worker = self._workers[self._next_worker]
+			self._next_worker = (self._next_worker + 1) % len(self._workers)
+		shard_id = self._next_id
+		self._next_id += 1
+		self._ids.insert(index, shard_id)
+		self._sizes.insert(index, 0)
+		self._worker_of[shard_id] = worker
+		self._prefix = None
+		return shard_id
+
+	def _call(self, index, fn, *args):
+		"""
+		Runs a shard operation on the shard at position index, and waits for its result.
+		"""
+		shard_id = self._ids[index]
+		return self._worker_of[shard_id].submit(fn, shard_id, *args).result()
+
+	def _route(self, key):
+		"""
+		returns the position of the shard whose range contains key
+		Time Complexity: O(log(number of shards)).
+
+		@rtype: int
+		"""
+		return bisect_right(self._bounds, key)
+
+	def _set_size(self, index, size):
+		self._sizes[index] = size
+		self._prefix = None
+
+#### Point operations #####
+
+	def search(self, key):
+		"""
+		searches for key in its shard
+
+		@rtype: tuple
+		@returns: the (key, value) item of key, None if key does not appear in the dictionary
+		"""
+		return self._call(self._route(key), _shard_search, key)
+
+	def insert(self, key, val):
+		"""
+		inserts an item into its shard (or replaces its value), splitting the shard if it becomes too large
+
+		@rtype: int
+		@returns: the number of rebalancing operation due to AVL rebalancing in the shard
+		"""
+		index = self._route(key)
+		rebalances, size = self._call(index, _shard_insert, key, val)
+		self._set_size(index, size)
+		self._rebalance(index)
+		return rebalances
+
+	def delete_key(self, key):
+		"""
+		deletes key from its shard, joining the shard to a neighbour if it becomes too small
+
+		@rtype: int
+		@returns: the number of rebalancing operation due to AVL rebalancing in the shard, 0 if key does not appear
+		"""
+		index = self._route(key)
+		rebalances, size = self._call(index, _shard_delete, key)
+		self._set_size(index, size)
+		self._rebalance(index)
+		return rebalances
+
+	def size(self):
+		"""
+		returns the number of items in the dictionary
+
+		@rtype: int
+		"""
+		return sum(self._sizes)
+
+	def shard_sizes(self):
+		"""
+		returns the sizes of the shards, in key order
+
+		@rtype: list of int
+		"""
+		return list(self._sizes)
+
+	def rank(self, key):
+		"""
+		computes the rank of key: its rank in its shard plus the sizes of the shards before it
+
+		@rtype: int
+		@returns: the rank of key, 0 if key does not appear in the dictionary
+		"""
+		index = self._route(key)
+		rank = self._call(index, _shard_rank, key)
+		if rank == 0:
+			return 0
+		return self._prefix_sums()[index] + rank
+
+	def select(self, i):
+		"""
+		finds the i'th smallest item: the shard is found by binary search on the prefix sums of the shard sizes
+
+		@type i: int
+		@pre: 1 <= i <= self.size()
+		@rtype: tuple
+		@returns: the (key, value) item of rank i
+		"""
+		prefix = self._prefix_sums()
+		index = bisect_left(prefix, i) - 1   # the last shard with fewer than i items before it
+		return self._call(index, _shard_select, i - prefix[index])
+
+	def _prefix_sums(self):
+		"""
+		returns the number of items before every shard, and the total size at the end
+		Time Complexity: O(1) if cached, O(number of shards) otherwise.
+
+		@rtype: list of int
+		"""
+		if self._prefix is None:
+			self._prefix = list(accumulate(self._sizes, initial=0))
+		return self._prefix
+
+#### Boundary rebalancing #####
+
+	def _rebalance(self, index):
+		"""
+		Splits the shard at position index if it is larger than max_shard_size,
+		or joins it with its smaller neighbour if it is smaller than min_shard_size and they fit in one shard.
+
+		@rtype: None
+		"""
+		size = self._sizes[index]
+		if size > self.max_shard_size:
+			worker = self._worker_of[self._ids[index]]
+			new_id = self._add_shard(index + 1, worker)
+			key, left_size, right_size = self._call(index, _shard_split, new_id)
+			self._bounds.insert(index, key)
+			self._set_size(index, left_size)
+			self._set_size(index + 1, right_size)
+		elif size < self.min_shard_size and len(self._ids) > 1:
+			neighbours = [i for i in (index - 1, index + 1) if 0 <= i < len(self._ids)]
+			other = min(neighbours, key=lambda i: self._sizes[i])
+			if size + self._sizes[other] <= self.max_shard_size:
+				self._merge(min(index, other))
+
+	def _merge(self, index):
+		"""
+		Joins the shard at position index + 1 into the shard at position index.
+		Shards of different workers are joined by moving the items of the second one.
+
+		@rtype: None
+		"""
+		left_id, right_id = self._ids[index], self._ids[index + 1]
+		worker = self._worker_of[left_id]
+		if self._worker_of[right_id] is worker:
+			size = worker.submit(_shard_merge, left_id, right_id).result()
+		else:
+			items = self._worker_of[right_id].submit(_shard_drop, right_id).result()
+			size = worker.submit(_shard_absorb, left_id, items).result()
+		del self._ids[index + 1], self._sizes[index + 1], self._bounds[index]
+		del self._worker_of[right_id]
+		self._set_size(index, size)
+
+#### Bulk operations #####
+
+	def insert_many(self, items):
+		"""
+		Inserts a batch of items. The batch is sorted and cut at the shard boundaries,
+		and every shard inserts its part (AVLTree.insert_many) in its worker, in parallel.
+		If a key appears more than once, the last value is kept.
+
+		@type items: iterable of tuples (key, value)
+		@rtype: None
+		"""
+		batch = sorted(items, key=lambda item: item[0])
+		keys = [key for key, _ in batch]
+		self._scatter(_shard_insert_many, batch, keys)
+
+	def delete_many(self, keys):
+		"""
+		Deletes a batch of keys, in parallel across the shards as insert_many.
+		Keys that do not appear in the dictionary are ignored.
+
+		@type keys: iterable
+		@rtype: None
+		"""
+		batch = sorted(keys)
+		self._scatter(_shard_delete_many, batch, batch)
+
+	def _scatter(self, fn, batch, keys):
+		"""
+		Sends every shard its part of a sorted batch, then rebalances the shards whose size changed.
+
+		@type keys: list
+		@param keys: the (sorted) keys of the batch elements
+		@rtype: None
+		"""
+		futures = {}
+		start = 0
+		for index in range(len(self._ids)):
+			end = bisect_left(keys, self._bounds[index]) if index < len(self._bounds) else len(keys)
+			if end > start:
+				shard_id = self._ids[index]
+				futures[index] = self._worker_of[shard_id].submit(fn, shard_id, batch[start:end])
+			start = end
+		pending = []            # ids of the shards to rebalance
+		for index, future in futures.items():
+			size = future.result()
+			if size != self._sizes[index]:
+				self._set_size(index, size)
+				pending.append(self._ids[index])
+		while pending:
+			shard_id = pending.pop()
+			if shard_id not in self._worker_of:     # joined into a neighbour meanwhile
+				continue
+			index = self._ids.index(shard_id)
+			count = len(self._ids)
+			self._rebalance(index)
+			if len(self._ids) > count:              # split - both halves may still be oversized
+				pending.extend((shard_id, self._ids[index + 1]))
+			elif len(self._ids) < count:            # joined - the joined shard may still be undersized
+				pending.append(shard_id if shard_id in self._worker_of else self._ids[index - 1])
+
+	def avl_to_array(self):
+		"""
+		Returns a sorted list of the items of the dictionary, the shards are exported in parallel.
+		Time Complexity: O(n), divided between the workers.
+
+		@rtype: list
+		"""
+		futures = [self._worker_of[shard_id].submit(_shard_export, shard_id) for shard_id in self._ids]
+		array = []
+		for future in futures:
+			array.extend(future.result())
+		return array
+
+	def count_range(self, a, b):
+		"""
+		counts the items with a<=key<=b
+		Shards entirely inside the range are counted by their cached size,
+		only the (at most two) boundary shards are asked, in parallel.
+
+		@rtype: int
+		"""
+		if a > b:
+			return 0
+		first, last = self._route(a), self._route(b)
+		if first == last:
+			return self._call(first, _shard_count_range, a, b)
+		ends = [self._worker_of[self._ids[index]].submit(_shard_count_range, self._ids[index], a, b)
+				for index in (first, last)]
+		return sum(self._sizes[first + 1:last]) + sum(future.result() for future in ends)
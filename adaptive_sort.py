@@ -0,0 +1,48 @@
+# Description: This file contains an adaptive sort and an inversion counter, built on the finger insertion of the AVL tree.
+# Tomer Nadiv & Ron Ben Harosh 2024
+
+from AVLTree import AVLTree
+
+"""
+Adaptive sorting with AVLTree.insert_from_max.
+Every item is inserted by climbing from the maximum of the tree to the first key that is not greater than it,
+so an item that is smaller than d earlier items costs O(log(d + 1)) (plus O(1) amortized rebalancing),
+and insert_from_max reports d, the number of inversions the item closes.
+Summing over the items, sorting costs O(n log(1 + I/n)) for I inversions: O(n) for sorted input, O(n log(n)) at worst.
+Equal items are inserted to the right of each other, so the sort is stable and equal items are not inversions.
+The items are the keys of the tree, with a constant value.
+"""
+
+
+def adaptive_sort(iterable):
+	"""
+	Sorts the items of an iterable, and counts its inversions.
+	The iterable is consumed once, as a stream.
+	Time Complexity: O(n log(1 + I/n)) for I inversions.
+
+	@type iterable: iterable of numbers
+	@rtype: tuple
+	@returns: (the sorted list of the items, the number of pairs i<j with item i > item j)
+	"""
+	tree = AVLTree()
+	insert_from_max = tree.insert_from_max
+	inversions = 0
+	for item in iterable:
+		inversions += insert_from_max(item, 0)[1]
+	return list(tree.keys()), inversions
+
+def count_inversions(iterable):
+	"""
+	Counts the inversions of an iterable - the pairs i<j with item i > item j.
+	Only the keys are kept in the tree (every value is the same constant), and no output list is built.
+	Time Complexity: O(n log(1 + I/n)) for I inversions.
+
+	@type iterable: iterable of numbers
+	@rtype: int
+	"""
+	tree = AVLTree()
+	insert_from_max = tree.insert_from_max
+	inversions = 0
+	for item in iterable:
+		inversions += insert_from_max(item, 0)[1]
+	return inversions
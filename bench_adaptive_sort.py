@@ -0,0 +1,80 @@
+"""
+Benchmark of adaptive_sort / count_inversions against sorted() and a merge-sort inversion counter.
+The input is nearly sorted: the sorted array 0..n-1 with a given fraction of random swaps (or a random permutation with --fraction 1).
+sorted() (Timsort) is also adaptive but does not count inversions; the merge sort counts them in O(n log(n)) regardless of the order.
+
+Usage:
+    python bench_adaptive_sort.py --sizes 100000 1000000 --fractions 0 0.001 0.01 0.1 1
+"""
+
+import argparse
+import random
+import time
+
+from adaptive_sort import adaptive_sort, count_inversions
+
+
+def nearly_sorted(n, fraction, seed=0):
+    rng = random.Random(seed)
+    array = list(range(n))
+    if fraction >= 1:
+        rng.shuffle(array)
+        return array
+    for _ in range(int(n * fraction)):
+        i, j = rng.randrange(n), rng.randrange(n)
+        array[i], array[j] = array[j], array[i]
+    return array
+
+def merge_sort_inversions(array):
+    """Bottom-up merge sort, returns (sorted list, number of inversions)."""
+    array = list(array)
+    n = len(array)
+    buffer = [None] * n
+    inversions = 0
+    width = 1
+    while width < n:
+        for lo in range(0, n, 2 * width):
+            mid = min(lo + width, n)
+            hi = min(lo + 2 * width, n)
+            i, j, k = lo, mid, lo
+            while i < mid and j < hi:
+                if array[j] < array[i]:
+                    buffer[k] = array[j]
+                    inversions += mid - i   # array[j] is smaller than every remaining item of the left run
+                    j += 1
+                else:
+                    buffer[k] = array[i]
+                    i += 1
+                k += 1
+            buffer[k:hi] = array[i:mid] if i < mid else array[j:hi]
+        array, buffer = buffer, array
+        width *= 2
+    return array, inversions
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000], help='array sizes')
+    parser.add_argument('--fractions', type=float, nargs='+', default=[0, 0.001, 0.01, 0.1, 1],
+                        help='random swaps per item (1 for a random permutation)')
+    args = parser.parse_args()
+
+    print('%10s %9s %14s %14s %14s %14s %14s' % ('n', 'fraction', 'inversions', 'adaptive_sort', 'count_inv', 'merge sort', 'sorted()'))
+    for n in args.sizes:
+        for fraction in args.fractions:
+            array = nearly_sorted(n, fraction)
+            adaptive_time, (output, inversions) = timed(adaptive_sort, array)
+            count_time, counted = timed(count_inversions, array)
+            merge_time, (merged, merge_inversions) = timed(merge_sort_inversions, array)
+            sorted_time, expected = timed(sorted, array)
+            assert output == merged == expected and inversions == counted == merge_inversions
+            print('%10d %9g %14d %13.3fs %13.3fs %13.3fs %13.3fs' % (
+                n, fraction, inversions, adaptive_time, count_time, merge_time, sorted_time))
+
+
+if __name__ == '__main__':
+    main()
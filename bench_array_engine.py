@@ -0,0 +1,100 @@
+"""
+Benchmark of the object-based AVLTree against the array-backed ArrayAVLTree.
+For every size, both engines insert the same pseudo-random permutation of range(n), then search and select a sample of keys.
+Reports wall time, operations per second and bytes per key (with --memory, measured by tracemalloc in a separate build).
+
+Usage:
+    python bench_array_engine.py --sizes 1000000 10000000
+    python bench_array_engine.py --sizes 100000000 --engines array --memory
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+from AVLTree import AVLTree
+from ArrayAVLTree import ArrayAVLTree
+
+ENGINES = {
+    'avl': lambda n: AVLTree(),
+    'array': lambda n: ArrayAVLTree(capacity=n),
+}
+
+MULTIPLIER = 2654435761  # Knuth's multiplicative hash constant, a prime
+
+
+def permutation(n):
+    """A pseudo-random permutation of range(n), generated lazily so huge sizes need no key list."""
+    step = MULTIPLIER
+    while n > 1 and _gcd(step, n) != 1:
+        step += 2
+    return ((i * step) % n for i in range(n))
+
+def _gcd(a, b):
+    while b:
+        a, b = b, a % b
+    return a
+
+def build(engine, n):
+    tree = ENGINES[engine](n)
+    insert = tree.insert
+    for k in permutation(n):
+        insert(k, k)
+    return tree
+
+def measure(engine, n, samples):
+    gc.collect()
+    start = time.perf_counter()
+    tree = build(engine, n)
+    insert_time = time.perf_counter() - start
+
+    queries = [k for _, k in zip(range(samples), permutation(n))]
+    start = time.perf_counter()
+    for k in queries:
+        tree.search(k)
+    search_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for k in queries:
+        tree.select(k + 1)
+    select_time = time.perf_counter() - start
+    del tree
+
+    return {
+        'engine': engine,
+        'n': n,
+        'insert_s': insert_time,
+        'insert_ops': n / insert_time,
+        'search_ops': len(queries) / search_time,
+        'select_ops': len(queries) / select_time,
+    }
+
+def measure_memory(engine, n):
+    gc.collect()
+    tracemalloc.start()
+    tree = build(engine, n)
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del tree
+    return used / n
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000000], help='numbers of keys')
+    parser.add_argument('--engines', nargs='+', choices=sorted(ENGINES), default=sorted(ENGINES))
+    parser.add_argument('--samples', type=int, default=100000, help='number of searched/selected keys')
+    parser.add_argument('--memory', action='store_true', help='also report bytes per key (slower, traced build)')
+    args = parser.parse_args()
+
+    print('%-6s %12s %10s %14s %14s %14s %12s' % ('engine', 'n', 'insert s', 'insert ops/s', 'search ops/s', 'select ops/s', 'bytes/key'))
+    for n in args.sizes:
+        for engine in args.engines:
+            row = measure(engine, n, min(args.samples, n))
+            memory = '%12.1f' % measure_memory(engine, n) if args.memory else '%12s' % '-'
+            print('%-6s %12d %10.2f %14.0f %14.0f %14.0f %s' % (
+                row['engine'], row['n'], row['insert_s'], row['insert_ops'], row['search_ops'], row['select_ops'], memory))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Multi-threaded read benchmark of ConcurrentAVLTree against an AVLTree behind one global lock.
+For every number of reader threads, the readers search random keys for a fixed duration
+while one writer thread keeps inserting and deleting keys. Reports the total and per-thread read throughput.
+
+ConcurrentAVLTree readers search the published immutable version without taking any lock,
+while in the global-lock mode every read waits for the writer's current operation.
+Note that on a CPython build with the GIL, pure-Python readers share one core,
+so total throughput scales with reader threads only on a free-threaded build;
+the lock-free readers still avoid the stalls behind the writer.
+
+Usage:
+    python bench_concurrent.py -n 100000 --threads 1 2 4 8
+    python bench_concurrent.py -n 1000000 --threads 1 4 --duration 5 --modes snapshot
+"""
+
+import argparse
+import random
+import threading
+import time
+
+from AVLTree import AVLTree
+from ConcurrentAVLTree import ConcurrentAVLTree
+
+
+class GlobalLockTree(object):
+    """The previous approach: one AVLTree, every call wrapped in one global lock."""
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.lock = threading.Lock()
+
+    def search(self, key):
+        with self.lock:
+            return self.tree.search(key)
+
+    def insert(self, key, val):
+        with self.lock:
+            self.tree.insert(key, val)
+
+    def delete(self, key):
+        with self.lock:
+            self.tree.delete_key(key)
+
+    def close(self):
+        pass
+
+
+def make(mode, n):
+    tree = AVLTree.from_sorted((2 * k, k) for k in range(n))   # even keys, the writer toggles odd keys
+    if mode == 'snapshot':
+        return ConcurrentAVLTree(tree)
+    return GlobalLockTree(tree)
+
+def writer(tree, n, stop, seed):
+    rng = random.Random(seed)
+    while not stop.is_set():
+        key = 2 * rng.randrange(n) + 1
+        tree.insert(key, key)
+        done = tree.delete(key)
+        if done is not None:   # wait for the queued write, so the queue does not grow without bound
+            done.result()
+
+def reader(tree, n, stop, seed, counts, index):
+    rng = random.Random(seed)
+    search = tree.search
+    done = 0
+    while not stop.is_set():
+        for _ in range(1000):
+            search(2 * rng.randrange(n))
+        done += 1000
+    counts[index] = done
+
+def run(mode, n, threads, duration):
+    tree = make(mode, n)
+    stop = threading.Event()
+    counts = [0] * threads
+    workers = [threading.Thread(target=writer, args=(tree, n, stop, -1))]
+    workers += [threading.Thread(target=reader, args=(tree, n, stop, i, counts, i)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    time.sleep(duration)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    tree.close()
+    return sum(counts) / duration
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', type=int, default=100000, help='number of keys in the tree')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8], help='numbers of reader threads')
+    parser.add_argument('--duration', type=float, default=2.0, help='seconds per measurement')
+    parser.add_argument('--modes', nargs='+', choices=['snapshot', 'global-lock'], default=['snapshot', 'global-lock'])
+    args = parser.parse_args()
+
+    print('%-12s %8s %16s %18s' % ('mode', 'readers', 'reads/s', 'reads/s/thread'))
+    for mode in args.modes:
+        for threads in args.threads:
+            total = run(mode, args.n, threads, args.duration)
+            print('%-12s %8d %16.0f %18.0f' % (mode, threads, total, total / threads))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Memory Benchmark for the AVL tree node layout.
+Builds a tree of n keys and reports the number of bytes allocated per stored key.
+Pass --compare with the path of another AVLTree.py (e.g. an older checkout) to report both layouts side by side.
+
+Usage:
+    python bench_memory.py -n 100000
+    git show <rev>:AVLTree.py > /tmp/AVLTree_old.py
+    python bench_memory.py -n 100000 --compare /tmp/AVLTree_old.py
+"""
+
+import argparse
+import gc
+import importlib.util
+import os
+import random
+import tracemalloc
+
+
+def load_module(path, name):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def bytes_per_key(module, n, seed=0):
+    # keys are allocated before tracing starts, so only the tree structure is measured
+    keys = list(range(n))
+    random.Random(seed).shuffle(keys)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tree = module.AVLTree()
+    for k in keys:
+        tree.insert(k, k)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert tree.size() == n
+    return (after - before) / n
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', type=int, default=100000, help='number of keys to insert')
+    parser.add_argument('--compare', metavar='PATH', help='another AVLTree.py to measure as the "before" layout')
+    args = parser.parse_args()
+
+    here = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'AVLTree.py')
+    results = []
+    if args.compare:
+        results.append(('before (%s)' % args.compare, bytes_per_key(load_module(args.compare, 'avl_before'), args.n)))
+    results.append(('after (%s)' % here, bytes_per_key(load_module(here, 'avl_after'), args.n)))
+
+    for label, value in results:
+        print('%-60s %8.1f bytes/key' % (label, value))
+    if len(results) == 2:
+        print('%-60s %8.2fx' % ('reduction', results[0][1] / results[1][1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+"""
+Benchmark suite for the AVLTree operations.
+Every operation is timed over every workload and size, and the results are written as JSON.
+Reported per run: wall time (best of --repeat), operations per second, the rebalance (or sort cost) counters,
+and with --memory the peak traced memory of a separate run.
+
+Workloads (the insertion order of the distinct keys 0..n-1, and the order of the queries):
+    sorted         - ascending keys
+    reverse        - descending keys
+    random         - a random permutation
+    nearly-sorted  - ascending keys with n/100 random swaps
+    zipf           - random insertion order, queries skewed towards a few hot keys (Zipf, s=1.1)
+
+Pass --baseline with an earlier JSON output to flag operations that got slower than --threshold.
+The exit status is 1 if any regression was flagged.
+
+Usage:
+    python benchmark.py --sizes 1000 10000 100000 --output results.json
+    python benchmark.py --sizes 100000 --ops insert search --workloads random zipf --memory
+    python benchmark.py --sizes 100000 --baseline results.json --threshold 0.1
+"""
+
+import argparse
+import gc
+import itertools
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from AVLTree import AVLTree
+
+WORKLOADS = ('sorted', 'reverse', 'random', 'nearly-sorted', 'zipf')
+OPS = ('insert', 'insert_from_max', 'delete', 'search', 'rank', 'select', 'max_range', 'avl_to_array')
+ZIPF_S = 1.1
+
+
+#### Workloads #####
+
+def make_workload(name, n, rng):
+    """Returns (keys in insertion order, query keys), both of length n."""
+    keys = list(range(n))
+    if name == 'reverse':
+        keys.reverse()
+    elif name in ('random', 'zipf'):
+        rng.shuffle(keys)
+    elif name == 'nearly-sorted':
+        for _ in range(n // 100):
+            i, j = rng.randrange(n), rng.randrange(n)
+            keys[i], keys[j] = keys[j], keys[i]
+    if name != 'zipf':
+        return keys, list(keys)
+    # the i'th hottest key is a random key, drawn with probability proportional to 1/i^s:
+    hot = rng.sample(range(n), n)
+    cum_weights = list(itertools.accumulate(1 / (i ** ZIPF_S) for i in range(1, n + 1)))
+    return keys, rng.choices(hot, cum_weights=cum_weights, k=n)
+
+def build(keys):
+    tree = AVLTree()
+    for k in keys:
+        tree.insert(k, k)
+    return tree
+
+
+#### Operations #####
+# every operation has a setup, untimed, returning the state of the run,
+# and a run, timed, returning (number of operations, counter name, counter value)
+
+def setup_empty(keys, queries):
+    return AVLTree(), keys
+
+def run_insert(state):
+    tree, keys = state
+    rebalances = 0
+    for k in keys:
+        rebalances += tree.insert(k, k)
+    return len(keys), 'rebalances', rebalances
+
+def run_insert_from_max(state):
+    tree, keys = state
+    cost = 0
+    for k in keys:
+        cost += tree.insert_from_max(k, k)[0]
+    return len(keys), 'sort_cost', cost
+
+def setup_built(keys, queries):
+    return build(keys), keys, queries
+
+def run_delete(state):
+    tree, keys, _ = state
+    rebalances = 0
+    for k in keys:
+        rebalances += tree.delete_key(k)
+    return len(keys), 'rebalances', rebalances
+
+def run_search(state):
+    tree, _, queries = state
+    search = tree.search
+    for k in queries:
+        search(k)
+    return len(queries), None, None
+
+def setup_rank(keys, queries):
+    tree = build(keys)
+    return tree, [tree.search(k) for k in queries]
+
+def run_rank(state):
+    tree, nodes = state
+    rank = tree.rank
+    for node in nodes:
+        rank(node)
+    return len(nodes), None, None
+
+def run_select(state):
+    tree, _, queries = state
+    select = tree.select
+    for k in queries:
+        select(k + 1)   # keys are 0..n-1, so the rank of k is k+1
+    return len(queries), None, None
+
+def run_max_range(state):
+    tree, _, queries = state
+    width = max(len(queries) // 100, 1)
+    max_range = tree.max_range
+    for k in queries:
+        max_range(k, k + width)
+    return len(queries), None, None
+
+def run_avl_to_array(state):
+    tree = state[0]
+    return len(tree.avl_to_array()), None, None
+
+OPERATIONS = {
+    'insert': (setup_empty, run_insert),
+    'insert_from_max': (setup_empty, run_insert_from_max),
+    'delete': (setup_built, run_delete),
+    'search': (setup_built, run_search),
+    'rank': (setup_rank, run_rank),
+    'select': (setup_built, run_select),
+    'max_range': (setup_built, run_max_range),
+    'avl_to_array': (setup_built, run_avl_to_array),
+}
+
+
+#### Measurement #####
+
+def measure(op, workload, n, repeat, memory, seed):
+    setup, run = OPERATIONS[op]
+    rng = random.Random('%s/%d/%d' % (workload, n, seed))
+    keys, queries = make_workload(workload, n, rng)
+    best = None
+    for _ in range(repeat):
+        state = setup(keys, queries)
+        gc.collect()
+        start = time.perf_counter()
+        count, counter, value = run(state)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        del state
+    result = {
+        'op': op,
+        'workload': workload,
+        'n': n,
+        'seconds': best,
+        'ops_per_sec': count / best if best > 0 else float('inf'),
+    }
+    if counter is not None:
+        result[counter] = value
+    if memory:
+        state = setup(keys, queries)
+        gc.collect()
+        tracemalloc.start()
+        run(state)
+        result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+def compare(results, baseline, threshold):
+    """Returns the results that are slower than their baseline run by more than threshold, with the ratio."""
+    previous = {(r['op'], r['workload'], r['n']): r for r in baseline['results']}
+    regressions = []
+    for result in results:
+        old = previous.get((result['op'], result['workload'], result['n']))
+        if old is not None and old['seconds'] > 0:
+            ratio = result['seconds'] / old['seconds']
+            if ratio > 1 + threshold:
+                regressions.append((result, ratio))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='numbers of keys')
+    parser.add_argument('--ops', nargs='+', choices=OPS, default=list(OPS))
+    parser.add_argument('--workloads', nargs='+', choices=WORKLOADS, default=list(WORKLOADS))
+    parser.add_argument('--repeat', type=int, default=3, help='runs per measurement, the fastest is reported')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--memory', action='store_true', help='also report peak memory (an extra traced run)')
+    parser.add_argument('--output', metavar='PATH', help='write the results as JSON')
+    parser.add_argument('--baseline', metavar='PATH', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10, help='slowdown ratio flagged as a regression')
+    args = parser.parse_args()
+
+    results = []
+    print('%-16s %-14s %10s %10s %14s %14s %14s' % ('op', 'workload', 'n', 'seconds', 'ops/s', 'counter', 'peak bytes'))
+    for n in args.sizes:
+        for workload in args.workloads:
+            for op in args.ops:
+                result = measure(op, workload, n, args.repeat, args.memory, args.seed)
+                results.append(result)
+                counter = result.get('rebalances', result.get('sort_cost'))
+                print('%-16s %-14s %10d %10.4f %14.0f %14s %14s' % (
+                    op, workload, n, result['seconds'], result['ops_per_sec'],
+                    '-' if counter is None else counter, result.get('peak_bytes', '-')))
+
+    report = {
+        'meta': {
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'repeat': args.repeat,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        for result, ratio in regressions:
+            print('REGRESSION %-16s %-14s %10d  %.2fx slower' % (result['op'], result['workload'], result['n'], ratio))
+        if not regressions:
+            print('no regressions over %.0f%%' % (100 * args.threshold))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+Parallel Experiment Runner for the insert_from_max (finger-tree sort) experiments of the notebook.
+Every (workload, size, seed) job sorts one array by inserting its items with insert_from_max,
+and records the sorting cost and the number of substitutions (inversions).
+Jobs run in a process pool, and every result is appended to a CSV file as soon as it finishes,
+so an interrupted run continues where it stopped when run again with the same output file.
+The results are averaged over the seeds and fed to plotting.analyze_experiment.
+
+Workloads:
+    inverted  - the sorted inverted array n, n-1, ..., 1 (the same for every seed)
+    random    - a random permutation of 1..n
+    sorted    - the sorted array 1, ..., n
+
+Usage:
+    python experiment_runner.py --sizes 2222 4444 8888 --seeds 0 1 2 --output results.csv
+    python experiment_runner.py --output results.csv --plot          # resume, then plot
+    python experiment_runner.py --output results.csv --parquet results.parquet
+"""
+
+import argparse
+import csv
+import os
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from AVLTree import AVLTree
+
+WORKLOADS = ('inverted', 'random', 'sorted')
+METRICS = ('sorting_cost', 'substitutions')
+FIELDS = ('workload', 'n', 'seed', 'sorting_cost', 'substitutions', 'seconds')
+NOTEBOOK_SIZES = [1111 * (2 ** i) for i in range(1, 6)]
+
+
+def make_array(workload, n, seed):
+    array = list(range(1, n + 1))
+    if workload == 'inverted':
+        array.reverse()
+    elif workload == 'random':
+        random.Random(seed).shuffle(array)
+    return array
+
+def run_job(workload, n, seed):
+    """Sorts one array with insert_from_max, returns the result row."""
+    array = make_array(workload, n, seed)
+    start = time.perf_counter()
+    tree = AVLTree()
+    sorting_cost = 0
+    substitutions = 0
+    for x in array:
+        cost, subs = tree.insert_from_max(x, x)
+        sorting_cost += cost
+        substitutions += subs
+    return {'workload': workload, 'n': n, 'seed': seed, 'sorting_cost': sorting_cost,
+            'substitutions': substitutions, 'seconds': time.perf_counter() - start}
+
+
+#### Results file #####
+
+def read_rows(path):
+    """Returns the rows of a results CSV file, an empty list if it does not exist."""
+    if not os.path.exists(path):
+        return []
+    with open(path, newline='') as file:
+        return [{'workload': row['workload'], 'n': int(row['n']), 'seed': int(row['seed']),
+                 'sorting_cost': int(row['sorting_cost']), 'substitutions': int(row['substitutions']),
+                 'seconds': float(row['seconds'])}
+                for row in csv.DictReader(file)]
+
+def run(jobs, path, workers=None):
+    """
+    Runs the jobs that have no row in the results file yet, appending each row as soon as its job finishes.
+    Returns all the rows of the file.
+    """
+    done = {(row['workload'], row['n'], row['seed']) for row in read_rows(path)}
+    pending = [job for job in jobs if job not in done]
+    # the longest jobs first, so the pool is not left waiting for one large job at the end:
+    pending.sort(key=lambda job: -job[1])
+    new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+    with open(path, 'a', newline='') as file, ProcessPoolExecutor(max_workers=workers) as pool:
+        writer = csv.DictWriter(file, fieldnames=FIELDS)
+        if new_file:
+            writer.writeheader()
+        futures = [pool.submit(run_job, *job) for job in pending]
+        for i, future in enumerate(as_completed(futures), 1):
+            row = future.result()
+            writer.writerow(row)
+            file.flush()
+            print('[%d/%d] %-9s n=%-9d seed=%-4d cost=%-12d subs=%-12d %.2fs' % (
+                i, len(pending), row['workload'], row['n'], row['seed'],
+                row['sorting_cost'], row['substitutions'], row['seconds']))
+    return read_rows(path)
+
+
+#### Aggregation #####
+
+def aggregate(rows, workload, metric):
+    """Returns (sizes, mean of metric over the seeds) of a workload, sorted by size."""
+    totals = defaultdict(list)
+    for row in rows:
+        if row['workload'] == workload:
+            totals[row['n']].append(row[metric])
+    sizes = sorted(totals)
+    return sizes, [sum(totals[n]) / len(totals[n]) for n in sizes]
+
+def analyze(rows, workload, metric, log_scale=True):
+    """Fits and plots the averaged results of a workload with plotting.analyze_experiment."""
+    import numpy as np                  # plotting and its dependencies are only needed here
+    from plotting import analyze_experiment
+    sizes, means = aggregate(rows, workload, metric)
+    return analyze_experiment(np.array(sizes), np.array(means), ylabel=metric.replace('_', ' '),
+                              log_scale=log_scale, suptitle='%s array - %s' % (workload.capitalize(), metric.replace('_', ' ')))
+
+def write_parquet(rows, path):
+    import pandas as pd                 # pandas (with pyarrow or fastparquet) is only needed for Parquet output
+    pd.DataFrame(rows, columns=FIELDS).to_parquet(path, index=False)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=NOTEBOOK_SIZES, help='array sizes')
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0], help='random seeds')
+    parser.add_argument('--workloads', nargs='+', choices=WORKLOADS, default=['inverted', 'random'])
+    parser.add_argument('--workers', type=int, default=None, help='processes (default: number of CPUs)')
+    parser.add_argument('--output', default='experiment_results.csv', help='CSV results file, appended to and resumed from')
+    parser.add_argument('--parquet', metavar='PATH', help='also write all the results as a Parquet file')
+    parser.add_argument('--plot', action='store_true', help='analyze every workload and metric with plotting.analyze_experiment')
+    args = parser.parse_args()
+
+    # only the random workload depends on the seed:
+    jobs = [(workload, n, seed) for workload in args.workloads for n in args.sizes
+            for seed in (args.seeds if workload == 'random' else args.seeds[:1])]
+    rows = run(jobs, args.output, args.workers)
+    if args.parquet:
+        write_parquet(rows, args.parquet)
+    if args.plot:
+        for workload in args.workloads:
+            for metric in METRICS:
+                analyze(rows, workload, metric)
+
+
+if __name__ == '__main__':
+    main()
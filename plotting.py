@@ -1,12 +1,13 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from sklearn.metrics import r2_score
-from sklearn.linear_model import LinearRegression
 
 """
 Plotting Function for Analyzing Experimental Results.
 Fit f(n) = n^2 and f(n) = n log2(n) to the experimental results, compare the R^2 values.
 Additional functions can be added for different transformations.
+
+The fits are closed-form NumPy least squares: for a model y = c*f(n) (no intercept), c = <f(n), y> / <f(n), f(n)>.
+fit_models fits many models at once and ranks them by R^2.
+matplotlib is only imported when plotting, so headless analysis (fit_models) starts fast.
 """
 
 
@@ -16,40 +17,94 @@ def transform_square(v):
 def transform_log2(v):
     return v * np.log2(v)
 
+def transform_linear(v):
+    return v
+
+def transform_log2_square(v):
+    return v * np.log2(v) ** 2
+
+# candidate models f(n) for fit_models, by name:
+MODELS = {
+    'n': transform_linear,
+    'n log2(n)': transform_log2,
+    'n log2^2(n)': transform_log2_square,
+    'n^2': transform_square,
+}
+
+def _pyplot():
+    import matplotlib.pyplot as plt   # imported on first plot only
+    return plt
+
 def calculate_r2(y_true, y_pred):
-    return r2_score(y_true, y_pred)
+    # same convention as sklearn.metrics.r2_score for a constant y_true: 1 for a perfect prediction, else 0
+    y_true = np.asarray(y_true, dtype=float).ravel()
+    y_pred = np.asarray(y_pred, dtype=float).ravel()
+    ss_res = np.sum((y_true - y_pred) ** 2)
+    ss_tot = np.sum((y_true - y_true.mean()) ** 2)
+    if ss_tot == 0:
+        return 1.0 if ss_res == 0 else 0.0
+    return 1 - ss_res / ss_tot
 
 def calculate_best_linear_approximation(v_transformed, result):
-    # Reshape the data for sklearn compatibility
-    v_transformed = v_transformed.reshape(-1, 1)
-    result = result.reshape(-1, 1)
-    
-    # Fit linear regression model with no intercept
-    model = LinearRegression(fit_intercept=False)
-    model.fit(v_transformed, result)
-    
-    # Extract the coefficient
-    c = model.coef_[0][0]
-    
-    return c
+    # least squares with no intercept: c = <x, y> / <x, x>
+    x = np.asarray(v_transformed, dtype=float).ravel()
+    y = np.asarray(result, dtype=float).ravel()
+    return np.dot(x, y) / np.dot(x, x)
+
+def fit_models(v, result, models=None):
+    """
+    Fits y = c*f(n) for every candidate model f at once, and ranks the models by R^2.
+    models is a dict {name: f}, a list of names of MODELS and/or callables (named by __name__), or None for all MODELS.
+    Returns a list of dicts {'model', 'coefficient', 'r2'}, best fit first.
+    """
+    if models is None:
+        models = MODELS
+    elif not isinstance(models, dict):
+        models = {m if isinstance(m, str) else getattr(m, '__name__', repr(m)): MODELS[m] if isinstance(m, str) else m
+                  for m in models}
+    v = np.asarray(v, dtype=float).ravel()
+    y = np.asarray(result, dtype=float).ravel()
+    names = list(models)
+    X = np.vstack([np.asarray(models[name](v), dtype=float).ravel() for name in names])   # one row per model
+
+    coefficients = (X @ y) / np.einsum('ij,ij->i', X, X)
+    residuals = y - coefficients[:, None] * X
+    ss_res = np.einsum('ij,ij->i', residuals, residuals)
+    ss_tot = np.sum((y - y.mean()) ** 2)
+    if ss_tot == 0:
+        r2 = np.where(ss_res == 0, 1.0, 0.0)
+    else:
+        r2 = 1 - ss_res / ss_tot
+
+    order = np.argsort(-r2, kind='stable')
+    return [{'model': names[i], 'coefficient': float(coefficients[i]), 'r2': float(r2[i])} for i in order]
+
+def format_fit_table(table):
+    lines = ['%-4s %-16s %16s %10s' % ('rank', 'model', 'coefficient', 'R^2')]
+    for rank, row in enumerate(table, 1):
+        lines.append('%-4d %-16s %16.6g %10.6f' % (rank, row['model'], row['coefficient'], row['r2']))
+    return '\n'.join(lines)
 
 def plot_transformed_vs_result(v_transformed, result, title, ylabel='result', log_scale=False):
+    plt = _pyplot()
     c = calculate_best_linear_approximation(v_transformed, result)
     y_approx = c * v_transformed
-    
+
     plt.scatter(v_transformed, result, color='blue')
     plt.plot(v_transformed, y_approx, color='orange', linestyle='--', label=f'y = {c:.2f}f(n)')  # Best fit line
     plt.title(title)
     plt.xlabel('f(n)')
     plt.ylabel(ylabel)
     plt.legend()
-    
+
     if log_scale:
         plt.xscale('log')
         plt.yscale('log')
     return c, y_approx
 
 def analyze_experiment(v, result, ylabel, log_scale=False, suptitle=''):
+    plt = _pyplot()
+
     # Transformations
     v_squared = transform_square(v)
     v_log2 = transform_log2(v)
@@ -73,4 +128,3 @@ def analyze_experiment(v, result, ylabel, log_scale=False, suptitle=''):
     plt.show()
 
     return r2_squared, r2_log2
-
@@ -1,15 +1,23 @@
 ## Written by Amitai Cohen 
 ## adjustment for AVL Trees by Eviatar, Yaron, and ChatGPT.
 ## Further modified for VirtualRoot by Tomer Nadiv.
+## render() lays the tree out in one pass and streams the rows, for large trees.
+
+"""
+Usage (render a tree saved with AVLTree.dump):
+    python print_tree.py tree.avl --output tree.txt
+    python print_tree.py tree.avl --max-depth 6 --focus 1234 --max-width 200
+"""
+
+import argparse
+import sys
 
 from AVLTree import *
 
 def printree(t, bykey=True):
     """Print a textual representation of t
     bykey=True: show keys instead of values"""
-    # Print the textual representation returned by trepr
-    for row in trepr(t.get_root(), bykey):
-        print(row)
+    render(t, sys.stdout, bykey)
 
 def trepr(t, bykey=False):
     """Return a list of textual representations of the levels in t
@@ -20,7 +28,7 @@ def trepr(t, bykey=False):
     if not t.is_real_node() and not isinstance(t, VirtualRoot):
         return []  # Skip virtual nodes
 
-    thistr = str(t.key) if bykey else str(t.val)
+    thistr = str(t.key) if bykey else str(t.value)
 
     return conc(trepr(t.left, bykey), thistr, trepr(t.right, bykey))
 
@@ -89,3 +97,121 @@ def rightspace(row):
         return 0
 
 
+
+
+def render(t, stream=None, bykey=True, max_depth=None, max_width=None, focus=None):
+    """Write a textual representation of t (a tree or a node) to stream, one level per two rows
+    bykey=True: show keys instead of values
+    max_depth: levels below it are cut, a node whose children are cut is marked with '+'
+    max_width: rows are cut after this many characters
+    focus: render only the subtree of the node with this key
+    Nodes are placed left to right in in-order, one column apart, so the layout is a single pass,
+    and the time is linear in the size of the output. Tombstones are shown in parentheses."""
+    if stream is None:
+        stream = sys.stdout
+    node = t.get_root() if hasattr(t, 'get_root') else t
+    if focus is not None:
+        node = find(node, focus)
+    if not is_real(node):
+        stream.write("#\n")
+        return
+
+    # in-order pass: x position of every node, and its level
+    levels = []  # per level, the nodes as (x, label, x of left child label end or None, x of right child or None)
+    placed = {}  # id(node) -> (x, width), for the children of the current node
+    x = 0
+    stack = []
+    depth = 0
+    while stack or is_real(node):
+        while is_real(node):
+            stack.append((node, depth))
+            if max_depth is not None and depth >= max_depth:
+                break
+            node, depth = node.left, depth + 1
+        node, depth = stack.pop()
+        cut = max_depth is not None and depth >= max_depth
+        label = str(node.key) if bykey else str(node.value)
+        if not getattr(node, 'live', True):
+            label = "(" + label + ")"
+        if cut and (is_real(node.left) or is_real(node.right)):
+            label += "+"
+        placed[id(node)] = (x, len(label))
+        while len(levels) <= depth:
+            levels.append([])
+        levels[depth].append([x, label, node])
+        x += len(label) + 1
+        node, depth = (None, depth) if cut else (node.right, depth + 1)
+
+    # rows, level by level: labels, then the branches to the next level
+    for depth, level in enumerate(levels):
+        labels = Row(max_width)
+        branches = Row(max_width)
+        for x, label, node in level:
+            labels.put(x, label)
+            if depth + 1 == len(levels):
+                continue
+            left = placed.get(id(node.left)) if is_real(node.left) else None
+            right = placed.get(id(node.right)) if is_real(node.right) else None
+            if left is not None:
+                end = left[0] + left[1]
+                branches.put(end, "_" * (x - 1 - end) + "/")
+            if right is not None:
+                start = x + len(label)
+                branches.put(start, "\\" + "_" * (right[0] - start - 1))
+        stream.write(labels.text() + "\n")
+        if depth + 1 < len(levels):
+            stream.write(branches.text() + "\n")
+
+class Row:
+    """A row of text built from left to right, cut after max_width characters"""
+    def __init__(self, max_width=None):
+        self.parts = []
+        self.width = 0
+        self.max_width = max_width
+
+    def put(self, x, text):
+        if self.max_width is not None and x + len(text) > self.max_width:
+            text = text[:max(self.max_width - x, 0)]
+        if text:
+            self.parts.append(" " * (x - self.width) + text)
+            self.width = x + len(text)
+
+    def text(self):
+        return "".join(self.parts)
+
+def is_real(node):
+    """helper for render"""
+    return node is not None and node.is_real_node()
+
+def find(node, key):
+    """helper for render: the node with key in the subtree of node (tombstones included)"""
+    while is_real(node):
+        if key == node.key:
+            return node
+        node = node.left if key < node.key else node.right
+    raise KeyError(key)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', help='a tree file written by AVLTree.dump')
+    parser.add_argument('--output', help='write to this file instead of the standard output')
+    parser.add_argument('--values', action='store_true', help='show values instead of keys')
+    parser.add_argument('--max-depth', type=int)
+    parser.add_argument('--max-width', type=int)
+    parser.add_argument('--focus', type=float, help='key of the root of the rendered subtree')
+    args = parser.parse_args()
+
+    tree = AVLTree.load(args.path)
+    focus = args.focus
+    if focus is not None and focus == int(focus):
+        focus = int(focus)
+    stream = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        render(tree, stream, not args.values, args.max_depth, args.max_width, focus)
+    finally:
+        if args.output:
+            stream.close()
+
+
+if __name__ == '__main__':
+    main()